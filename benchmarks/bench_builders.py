@@ -0,0 +1,43 @@
+"""
+Compare the YAML text builders of BaseModel, parsed back with yaml.safe_load as the managers used to,
+against the dict builders on large label and env sets.
+
+    python -m benchmarks.bench_builders
+"""
+import timeit
+
+import yaml
+
+from kubernetes.utils import BaseModel, KeyValueModel
+
+NUMBER = 50
+SIZE = 1000
+
+
+def main():
+    model = BaseModel()
+    data = [KeyValueModel(name=f'key-{i}', value=f'value-{i}') for i in range(SIZE)]
+    scenarios = {
+        'labels': (
+            lambda: yaml.safe_load('labels:\n' + model.get_key_value_params_labels(data=data, indent_line=2)),
+            lambda: model.get_key_value_labels(data=data),
+        ),
+        'envs': (
+            lambda: yaml.safe_load('env:\n' + model.get_key_value_params_envs(data=data, indent_line=2)),
+            lambda: model.get_key_value_envs(data=data),
+        ),
+    }
+    assert scenarios['labels'][0]()['labels'] == scenarios['labels'][1]()
+    assert scenarios['envs'][0]()['env'] == scenarios['envs'][1]()
+    print(f'{SIZE} items, {NUMBER} builds')
+    for name, (text_builder, dict_builder) in scenarios.items():
+        text_seconds = timeit.timeit(text_builder, number=NUMBER)
+        dict_seconds = timeit.timeit(dict_builder, number=NUMBER)
+        print(
+            f'{name:8} text+safe_load {text_seconds / NUMBER * 1e3:9.2f} ms '
+            f'dict {dict_seconds / NUMBER * 1e3:9.3f} ms {text_seconds / dict_seconds:8.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Import time of the package entry points, each measured in a fresh interpreter, next to the eager imports
+configuration/__init__.py used to do, and the cloud SDKs each entry point leaves loaded.
+
+    python -m benchmarks.bench_import
+"""
+import os
+import subprocess
+import sys
+import time
+
+NUMBER = 5
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOUD_MODULES = (
+    'boto3',
+    'botocore',
+    'awscli',
+    'google.auth',
+    'google.cloud.container_v1',
+    'grpc',
+    'azure.identity',
+    'azure.mgmt.containerservice',
+)
+TARGETS = {
+    'interpreter': 'pass',
+    'eager cloud SDKs': (
+        'import boto3, botocore.session, awscli.customizations.eks.get_token, google.auth, '
+        'google.auth.transport.requests, google.cloud.container_v1, azure.identity, azure.mgmt.containerservice'
+    ),
+    'configuration': 'import configuration',
+    'configuration.fan_out': 'import configuration.fan_out',
+    'configuration.auth_config': 'import configuration.auth_config',
+    'aws builder': 'from configuration import get_aws_kube_configuration',
+    'gcp builder': 'from configuration import get_kube_configuration',
+    'azure builder': 'from configuration.azure.azure_config import get_azure_kubernetes_config',
+}
+
+
+def _run(statement: str) -> str:
+    script = f'{statement}\nimport sys\nprint(",".join(m for m in {CLOUD_MODULES!r} if m in sys.modules))'
+    return subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout.strip()
+
+
+def import_seconds(statement: str) -> tuple:
+    """
+    Best of NUMBER wall clock runs, and the cloud modules loaded afterwards.
+    """
+    best, loaded = None, ''
+    for _ in range(NUMBER):
+        start = time.perf_counter()
+        loaded = _run(statement)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded
+
+
+def main():
+    print(f'best of {NUMBER} fresh interpreters')
+    for name, statement in TARGETS.items():
+        try:
+            seconds, loaded = import_seconds(statement)
+        except subprocess.CalledProcessError as e:
+            print(f'{name:28} failed: {e.stderr.strip().splitlines()[-1]}')
+            continue
+        print(f'{name:28} {seconds * 1e3:9.1f} ms  {loaded or "-"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare yaml.safe_load against kubernetes.manifest.load_manifest on a ~300 line Deployment.
+
+    python -m benchmarks.bench_manifest
+"""
+import timeit
+
+import yaml
+
+from kubernetes.manifest import load_manifest, ManifestCache
+
+NUMBER = 200
+
+
+def deployment_yaml(containers: int = 4, envs: int = 24) -> str:
+    lines = [
+        'apiVersion: apps/v1',
+        'kind: Deployment',
+        'metadata:',
+        '  name: engine',
+        '  labels:',
+        '    app: engine',
+        '    cluster_uuid: 5b0f6d3e-2c1a-4f7e-9d8b-0a1b2c3d4e5f',
+        'spec:',
+        '  replicas: 3',
+        '  selector:',
+        '    matchLabels:',
+        '      app: engine',
+        '  template:',
+        '    metadata:',
+        '      labels:',
+        '        app: engine',
+        '      annotations:',
+        '        prometheus.io/scrape: "true"',
+        '    spec:',
+        '      serviceAccountName: engine',
+        '      containers:',
+    ]
+    for i in range(containers):
+        lines += [
+            f'        - name: container-{i}',
+            f'          image: registry.example.com:5000/team/engine-{i}:1.0.{i}',
+            '          imagePullPolicy: IfNotPresent',
+            '          ports:',
+            '            - containerPort: 8080',
+            '              protocol: TCP',
+            '          env:',
+        ]
+        for j in range(envs):
+            lines += [
+                f'            - name: ENV_{i}_{j}',
+                f'              value: "value-{j}"',
+            ]
+        lines += [
+            '          resources:',
+            '            requests:',
+            '              cpu: 500m',
+            '              memory: 512Mi',
+            '            limits:',
+            '              cpu: "2"',
+            '              memory: 2Gi',
+            '          readinessProbe:',
+            '            httpGet:',
+            '              path: /health',
+            '              port: 8080',
+            '            periodSeconds: 10',
+            '          volumeMounts:',
+            '            - name: config',
+            '              mountPath: /etc/engine',
+        ]
+    lines += [
+        '      volumes:',
+        '        - name: config',
+        '          configMap:',
+        '            name: engine-config',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    content = deployment_yaml()
+    assert yaml.safe_load(content) == load_manifest(content)
+    results = {
+        'yaml.safe_load': timeit.timeit(lambda: yaml.safe_load(content), number=NUMBER),
+        'load_manifest (cold, CSafeLoader)': timeit.timeit(lambda: ManifestCache().load(content), number=NUMBER),
+        'load_manifest (warm)': timeit.timeit(lambda: load_manifest(content), number=NUMBER),
+    }
+    print(f'Deployment manifest: {len(content.splitlines())} lines, {NUMBER} loads')
+    baseline = results['yaml.safe_load']
+    for name, seconds in results.items():
+        print(f'{name:36} {seconds / NUMBER * 1e6:10.1f} us/load {baseline / seconds:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
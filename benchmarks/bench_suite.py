@@ -0,0 +1,298 @@
+"""
+End to end benchmarks of the configuration builders and managers against benchmarks.fake_apiserver and
+benchmarks.fake_clouds. Prints, or writes to --output, a JSON report to compare runs of different versions.
+
+    python -m benchmarks.bench_suite --latency 0.002 --cloud-latency 0.05 --error-rate 0.01 --output report.json
+
+Scenarios:
+    config_build  cold and warm-metadata AWS, GCP and Azure builds, and a ConfigurationCache hit
+    single_write  config map create and patch, deployment scale patch
+    bulk_list     deployments listed in one response and in pages of 500
+    fan_out       list config maps on many EKS clusters through FanOutExecutor: cold, after EKSClusterRegistry.warm
+                  and with cached builds
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_apiserver import FakeApiServer
+from benchmarks.fake_clouds import stub_clouds, ROLE_ARN
+from configuration.aws.eks import get_aws_kube_configuration, eks_clusters
+from configuration.aws.clouds import get_configuration
+from configuration.aws.credentials import credential_provider
+from configuration.azure.azure_config import get_azure_kubernetes_config, token_cache
+from configuration.azure.azure_config import cluster_metadata_cache as aks_metadata_cache
+from configuration.cache import configuration_cache
+from configuration.fan_out import ClusterDescriptor, FanOutExecutor
+from configuration.gcp.gke import get_kube_configuration
+from configuration.gcp.gke import cluster_metadata_cache as gke_metadata_cache
+from kubernetes import client
+from kubernetes.api_client_registry import api_client_registry, get_api_client
+from kubernetes.config_map import ConfigMapManager
+from kubernetes.deployments import DeploymentManager
+from kubernetes.metrics import metrics
+from kubernetes.throttle import throttle_registry
+
+NAMESPACE = 'bench'
+REGION = 'us-east-1'
+SCENARIOS = ('config_build', 'single_write', 'bulk_list', 'fan_out')
+AWS_PARAMS = dict(iam_role_arn=ROLE_ARN, cluster_id='bench', region=REGION)
+GCP_PARAMS = dict(project_id='bench-project', cluster_id='bench', region=REGION)
+AZURE_PARAMS = dict(
+    tenant_id='bench-tenant',
+    client_id='bench-client',
+    client_secret='bench-secret',
+    resource_group='bench-rg',
+    cluster_name='bench',
+    subscription_id='bench-subscription'
+)
+PROPERTIES = {f'engine.setting.{i}': f'value-{i}' for i in range(50)}
+
+
+def _percentile(durations: list, q: float) -> float:
+    return durations[min(len(durations) - 1, int(q * len(durations)))]
+
+
+def measure(func, iterations: int, warmup: int = 1) -> dict:
+    """
+    Latency summary in milliseconds of func called iterations times after warmup calls.
+    """
+    for _ in range(warmup):
+        func()
+    durations, errors, last_error = [], 0, None
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            errors += 1
+            last_error = repr(e)
+        durations.append(time.perf_counter() - call_start)
+    total = time.perf_counter() - start
+    durations.sort()
+    result = dict(
+        iterations=iterations,
+        errors=errors,
+        total_seconds=round(total, 6),
+        ops_per_second=round(iterations / total, 3),
+        mean_ms=round(sum(durations) / iterations * 1e3, 3),
+        min_ms=round(durations[0] * 1e3, 3),
+        p50_ms=round(_percentile(durations, 0.50) * 1e3, 3),
+        p90_ms=round(_percentile(durations, 0.90) * 1e3, 3),
+        p99_ms=round(_percentile(durations, 0.99) * 1e3, 3),
+        max_ms=round(durations[-1] * 1e3, 3),
+    )
+    if last_error:
+        result['last_error'] = last_error
+    return result
+
+
+def bench_config_build(server: FakeApiServer, api_client, args) -> dict:
+    def aws():
+        credential_provider.invalidate(ROLE_ARN)
+        eks_clusters.clear()
+        get_aws_kube_configuration(**AWS_PARAMS)
+
+    def aws_cached_metadata():
+        get_aws_kube_configuration(**AWS_PARAMS)
+
+    def gcp():
+        gke_metadata_cache.clear()
+        get_kube_configuration(**GCP_PARAMS)
+
+    def gcp_cached_metadata():
+        get_kube_configuration(**GCP_PARAMS)
+
+    def azure():
+        token_cache.clear()
+        aks_metadata_cache.clear()
+        get_azure_kubernetes_config(**AZURE_PARAMS)
+
+    def azure_cached_tokens():
+        aks_metadata_cache.clear()
+        get_azure_kubernetes_config(**AZURE_PARAMS)
+
+    def cached():
+        get_configuration('AWS', **AWS_PARAMS)
+
+    configuration_cache.clear()
+    return {
+        'aws_cold': measure(aws, args.iterations),
+        'aws_cached_metadata': measure(aws_cached_metadata, args.iterations),
+        'gcp_cold': measure(gcp, args.iterations),
+        'gcp_cached_metadata': measure(gcp_cached_metadata, args.iterations),
+        'azure_cold': measure(azure, args.iterations),
+        'azure_cached_tokens': measure(azure_cached_tokens, args.iterations),
+        'cache_hit': measure(cached, args.iterations),
+    }
+
+
+def bench_single_write(server: FakeApiServer, api_client, args) -> dict:
+    config_maps = ConfigMapManager(NAMESPACE, api_client=api_client)
+    deployments = DeploymentManager(NAMESPACE, api_client=api_client)
+    names = (f'bench-create-{i}' for i in itertools.count())
+    versions = itertools.count()
+    config_maps.create('bench-patch', PROPERTIES)
+    server.add(f'apis/apps/v1/namespaces/{NAMESPACE}/deployments', _deployment('bench-scale'))
+    return {
+        'config_map_create': measure(lambda: config_maps.create(next(names), PROPERTIES), args.iterations),
+        'config_map_patch': measure(
+            lambda: config_maps.patch('bench-patch', dict(PROPERTIES, version=next(versions))),
+            args.iterations
+        ),
+        'deployment_patch_scale': measure(
+            lambda: deployments.patch_scale('bench-scale', replicas=next(versions) % 5),
+            args.iterations
+        ),
+    }
+
+
+def bench_bulk_list(server: FakeApiServer, api_client, args) -> dict:
+    deployments = DeploymentManager(NAMESPACE, api_client=api_client)
+    for i in range(args.list_size):
+        server.add(f'apis/apps/v1/namespaces/{NAMESPACE}/deployments', _deployment(f'bench-list-{i:06}'))
+    return {
+        f'deployments_{args.list_size}_single': measure(deployments.list_namespaced_deployment, args.list_iterations),
+        f'deployments_{args.list_size}_paged': measure(
+            lambda: sum(1 for _ in deployments.iter_namespaced_deployment()),
+            args.list_iterations
+        ),
+    }
+
+
+def bench_fan_out(server: FakeApiServer, api_client, args) -> dict:
+    clusters = [
+        ClusterDescriptor('AWS', dict(AWS_PARAMS, cluster_id=f'bench-{i}'), name=f'bench-{i}')
+        for i in range(args.clusters)
+    ]
+    executor = FanOutExecutor()
+
+    def operation(configuration, cluster):
+        config_maps = ConfigMapManager(NAMESPACE, api_client=api_client_registry.get(configuration))
+        return len(config_maps.list_namespaced_config_map().items)
+
+    def run():
+        failed = [result for result in executor.run_all(clusters, operation) if not result.ok]
+        if failed:
+            raise Exception(f'{len(failed)} of {len(clusters)} clusters failed, first: {failed[0].error}')
+
+    def cold():
+        configuration_cache.clear()
+        api_client_registry.shutdown()
+        credential_provider.invalidate(ROLE_ARN)
+        eks_clusters.clear()
+        run()
+
+    def warmed():
+        configuration_cache.clear()
+        eks_clusters.warm(REGION, ROLE_ARN, cluster_ids=[cluster.params['cluster_id'] for cluster in clusters])
+        run()
+
+    return {
+        f'clusters_{args.clusters}_cold': measure(cold, args.fan_out_iterations),
+        f'clusters_{args.clusters}_warmed': measure(warmed, args.fan_out_iterations),
+        f'clusters_{args.clusters}_cached': measure(run, args.fan_out_iterations),
+    }
+
+
+def _deployment(name: str) -> dict:
+    labels = {'app': name, 'cluster_uuid': 'bench'}
+    return {
+        'apiVersion': 'apps/v1',
+        'kind': 'Deployment',
+        'metadata': {'name': name, 'namespace': NAMESPACE, 'labels': labels},
+        'spec': {
+            'replicas': 1,
+            'selector': {'matchLabels': labels},
+            'template': {
+                'metadata': {'labels': labels},
+                'spec': {'containers': [{'name': 'engine', 'image': 'registry.example.com:5000/engine:1.0.0'}]},
+            },
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--list-size', type=int, default=2000)
+    parser.add_argument('--list-iterations', type=int, default=20)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--fan-out-iterations', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API server request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many seconds more per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API requests failed with 503')
+    parser.add_argument('--cloud-latency', type=float, default=0.0, help='Seconds added to every cloud call')
+    # The library default of 20 QPS per cluster would dominate every API scenario.
+    parser.add_argument('--qps', type=float, default=1000)
+    parser.add_argument('--burst', type=int, default=1000)
+    parser.add_argument('--metrics', action='store_true', help='Enable kubernetes.metrics and embed its export')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.metrics:
+        metrics.enable()
+    scenarios = dict(
+        config_build=bench_config_build,
+        single_write=bench_single_write,
+        bulk_list=bench_bulk_list,
+        fan_out=bench_fan_out,
+    )
+    report = dict(
+        created_at=datetime.now(timezone.utc).isoformat(),
+        git_commit=_git_commit(),
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        parameters={k: v for k, v in vars(args).items() if k != 'output'},
+        scenarios=dict(),
+    )
+    with FakeApiServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed) as server:
+        throttle_registry.configure(server.url, qps=args.qps, burst=args.burst)
+        api_client = get_api_client(configuration=client.Configuration(host=server.url))
+        with stub_clouds(endpoint=server.url, latency=args.cloud_latency):
+            for name in args.scenarios:
+                try:
+                    report['scenarios'][name] = scenarios[name](server, api_client, args)
+                except Exception as e:
+                    report['scenarios'][name] = dict(error=repr(e))
+        report['api_server'] = server.stats()
+        report['throttle'] = throttle_registry.stats()
+    if args.metrics:
+        report['metrics'] = metrics.render_prometheus()
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
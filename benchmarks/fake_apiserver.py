@@ -0,0 +1,288 @@
+"""
+In-memory stand-in for the Kubernetes API server, good enough for the calls the managers make:
+get, list (labelSelector, fieldSelector, limit and continue), create, merge patch, replace and delete of
+namespaced and cluster scoped objects. Every request can be delayed and a share of them failed with a
+throttling status to exercise the client's retries.
+
+    with FakeApiServer(latency=0.005, error_rate=0.01) as server:
+        configuration = client.Configuration(host=server.url)
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+_SELECTOR_TERM = re.compile(r'^\s*(!?)([\w./-]+)\s*(?:(==|=|!=)\s*(\S*)|\s+(in|notin)\s*\(([^)]*)\))?\s*$')
+
+
+def _merge(target: dict, patch: dict) -> dict:
+    """
+    JSON merge patch, which matches strategic merge for the map-only bodies the benchmarks send.
+    """
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            # Nulls inside a new map are dropped too, as the API server does.
+            target[key] = _merge(target[key] if isinstance(target.get(key), dict) else {}, value)
+        else:
+            target[key] = value
+    return target
+
+
+def _split_selector(selector: str) -> list:
+    terms, depth, current = [], 0, ''
+    for char in selector:
+        if char == ',' and depth == 0:
+            terms.append(current)
+            current = ''
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current += char
+    return [term for term in terms + [current] if term.strip()]
+
+
+def _matches_labels(labels: dict, selector: str) -> bool:
+    for term in _split_selector(selector or ''):
+        match = _SELECTOR_TERM.match(term)
+        if match is None:
+            raise ValueError(f'Unsupported label selector {term}')
+        negated, key, operator, value, set_operator, values = match.groups()
+        if operator in ('=', '=='):
+            ok = labels.get(key) == value
+        elif operator == '!=':
+            ok = labels.get(key) != value
+        elif set_operator:
+            options = {option.strip() for option in values.split(',')}
+            ok = (labels.get(key) in options) == (set_operator == 'in')
+        else:
+            ok = (key in labels) != bool(negated)
+        if not ok:
+            return False
+    return True
+
+
+def _matches_fields(obj: dict, selector: str) -> bool:
+    for term in _split_selector(selector or ''):
+        key, _, value = term.partition('=')
+        negated = key.endswith('!')
+        current = obj
+        for part in key.rstrip('!').strip().split('.'):
+            current = current.get(part) if isinstance(current, dict) else None
+        if (str(current) == value.lstrip('=').strip()) == negated:
+            return False
+    return True
+
+
+def _parse_path(path: str):
+    """
+    Returns (collection, name, subresource), None for paths outside /api and /apis.
+    """
+    parts = [part for part in path.split('/') if part]
+    if parts[:1] == ['api']:
+        prefix = 2
+    elif parts[:1] == ['apis']:
+        prefix = 3
+    else:
+        return None
+    rest = parts[prefix:]
+    scope = 3 if rest[:1] == ['namespaces'] and len(rest) >= 3 else 1
+    collection = '/'.join(parts[:prefix] + rest[:scope])
+    rest = rest[scope:]
+    return collection, (rest[0] if rest else None), (rest[1] if len(rest) > 1 else None)
+
+
+class FakeApiServer:
+    """
+    latency is added to every request, plus up to jitter seconds. A random error_rate share of requests is
+    answered with error_status and Retry-After: 0.
+    """
+
+    def __init__(
+            self,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            error_status: int = 503,
+            seed: int = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__objects = dict()
+        self.__resource_version = 0
+        self.requests = dict()
+        self.injected_errors = 0
+        self.__server = ThreadingHTTPServer((host, port), _Handler)
+        self.__server.daemon_threads = True
+        self.__server.fake = self
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name='fake-apiserver', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self.__lock:
+            self.requests = dict()
+            self.injected_errors = 0
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return dict(requests=dict(self.requests), injected_errors=self.injected_errors)
+
+    def __next_resource_version(self) -> str:
+        self.__resource_version += 1
+        return str(self.__resource_version)
+
+    def add(self, collection: str, obj: dict) -> dict:
+        """
+        Store obj under a collection path such as apis/apps/v1/namespaces/default/deployments.
+        """
+        with self.__lock:
+            return self.__store(collection, obj)
+
+    def __store(self, collection, obj):
+        metadata = obj.setdefault('metadata', {})
+        metadata.setdefault('uid', str(uuid.uuid4()))
+        metadata.setdefault('creationTimestamp', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+        metadata['resourceVersion'] = self.__next_resource_version()
+        self.__objects.setdefault(collection, dict())[metadata['name']] = obj
+        return obj
+
+    def handle(self, method: str, path: str, query: dict, body):
+        """
+        Returns (status, headers, payload).
+        """
+        with self.__lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+        delay = self.latency + (self.__random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self.__random.random() < self.error_rate:
+            with self.__lock:
+                self.injected_errors += 1
+            return _status(self.error_status, 'Injected error', headers={'Retry-After': '0'})
+        parsed = _parse_path(path)
+        if parsed is None:
+            return _status(404, f'Unknown path {path}')
+        collection, name, subresource = parsed
+        if method == 'GET' and query.get('watch') in ('true', '1'):
+            time.sleep(min(float(query.get('timeoutSeconds', 1)), 1))
+            return 200, {}, b''
+        with self.__lock:
+            # Encoded while holding the lock, so concurrent patches never show through half applied.
+            status, headers, payload = self.__apply(method, path, collection, name, subresource, query, body)
+            return status, headers, payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+
+    def __apply(self, method, path, collection, name, subresource, query, body):
+        objects = self.__objects.setdefault(collection, dict())
+        if name is None:
+            if method == 'GET':
+                return self.__list(collection, objects, query)
+            if method == 'POST':
+                name = (body.get('metadata') or {}).get('name')
+                if name in objects:
+                    return _status(409, f'{name} already exists', reason='AlreadyExists')
+                return 201, {}, self.__store(collection, body)
+            if method == 'DELETE':
+                for item_name in [n for n, o in objects.items() if self.__selected(o, query)]:
+                    del objects[item_name]
+                return _status(200, 'Deleted', status='Success')
+            return _status(405, f'{method} not allowed on {path}')
+        obj = objects.get(name)
+        if obj is None:
+            return _status(404, f'{name} not found', reason='NotFound')
+        if method == 'GET':
+            return 200, {}, obj
+        if method == 'PATCH':
+            if subresource == 'scale':
+                body = {'spec': {'replicas': (body.get('spec') or {}).get('replicas')}}
+            _merge(obj, body)
+            return 200, {}, self.__store(collection, obj)
+        if method == 'PUT':
+            return 200, {}, self.__store(collection, body)
+        if method == 'DELETE':
+            del objects[name]
+            return 200, {}, obj
+        return _status(405, f'{method} not allowed on {path}')
+
+    @staticmethod
+    def __selected(obj, query) -> bool:
+        labels = (obj.get('metadata') or {}).get('labels') or {}
+        return _matches_labels(labels, query.get('labelSelector')) and _matches_fields(obj, query.get('fieldSelector'))
+
+    def __list(self, collection, objects, query):
+        names = sorted(name for name, obj in objects.items() if self.__selected(obj, query))
+        token = query.get('continue')
+        if token:
+            after = base64.urlsafe_b64decode(token.encode()).decode()
+            names = [name for name in names if name > after]
+        limit = int(query.get('limit') or 0)
+        metadata = {'resourceVersion': str(self.__resource_version)}
+        if limit and len(names) > limit:
+            names = names[:limit]
+            metadata['continue'] = base64.urlsafe_b64encode(names[-1].encode()).decode()
+        return 200, {}, {'kind': 'List', 'apiVersion': 'v1', 'metadata': metadata, 'items': [objects[n] for n in names]}
+
+
+def _status(code, message, reason=None, status='Failure', headers=None):
+    return code, headers or {}, {
+        'kind': 'Status',
+        'apiVersion': 'v1',
+        'status': status,
+        'code': code,
+        'reason': reason or '',
+        'message': message,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def __dispatch(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, headers, payload = self.server.fake.handle(self.command, url.path, query, body)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = __dispatch
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,159 @@
+"""
+Canned STS/EKS, GKE and AKS responses for timing the configuration builders without real clouds.
+stub_clouds patches the SDK entry points the builders go through, each stubbed call sleeping latency seconds
+to stand in for the network round trip, and points every cluster endpoint at endpoint.
+
+    with stub_clouds(endpoint=server.url, latency=0.05):
+        configuration = get_aws_kube_configuration(iam_role_arn=ROLE_ARN, cluster_id='bench', region='us-east-1')
+"""
+import base64
+import json
+import time
+from contextlib import contextmanager, ExitStack
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import urlparse
+
+import botocore.client
+import requests
+import yaml
+
+ACCOUNT_ID = '000000000000'
+ROLE_ARN = f'arn:aws:iam::{ACCOUNT_ID}:role/bench'
+CA_DATA = base64.b64encode(
+    b'-----BEGIN CERTIFICATE-----\nYmVuY2htYXJrIGNlcnRpZmljYXRlIGF1dGhvcml0eQ==\n-----END CERTIFICATE-----\n'
+).decode()
+AZURE_LOGIN_HOST = 'login.microsoftonline.com'
+AZURE_MANAGEMENT_HOST = 'management.azure.com'
+TOKEN_LIFETIME = timedelta(hours=1)
+
+
+class _FakeGoogleCredentials:
+    def __init__(self, latency):
+        self.__latency = latency
+        self.token = None
+        self.expiry = None
+
+    @property
+    def valid(self) -> bool:
+        return self.token is not None and self.expiry > datetime.utcnow()
+
+    @property
+    def expired(self) -> bool:
+        return not self.valid
+
+    def refresh(self, request):
+        time.sleep(self.__latency)
+        self.token = 'ya29.bench'
+        self.expiry = datetime.utcnow() + TOKEN_LIFETIME
+
+    def before_request(self, request, method, url, headers):
+        if not self.valid:
+            self.refresh(request)
+        headers['authorization'] = f'Bearer {self.token}'
+
+
+class _FakeClusterManagerClient:
+    def __init__(self, endpoint, latency, **kwargs):
+        self.__endpoint = endpoint
+        self.__latency = latency
+
+    def get_cluster(self, request=None, name=None, **kwargs):
+        time.sleep(self.__latency)
+        return SimpleNamespace(
+            name=(name or '').rsplit('/', 1)[-1],
+            endpoint=urlparse(self.__endpoint).netloc,
+            master_auth=SimpleNamespace(cluster_ca_certificate=CA_DATA)
+        )
+
+
+def _kubeconfig(cluster_name: str, endpoint: str) -> str:
+    return yaml.safe_dump({
+        'apiVersion': 'v1',
+        'kind': 'Config',
+        'clusters': [{
+            'name': cluster_name,
+            'cluster': {'certificate-authority-data': CA_DATA, 'server': endpoint},
+        }],
+    })
+
+
+def _json_response(url, payload, status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps(payload).encode()
+    return response
+
+
+@contextmanager
+def stub_clouds(endpoint: str, latency: float = 0.0):
+    """
+    Within the block STS AssumeRole, EKS DescribeCluster, GKE get_cluster and ADC token refresh,
+    Azure AD tokens, the AKS managed cluster GET and listClusterUserCredential answer locally.
+    """
+    make_api_call = botocore.client.BaseClient._make_api_call
+    session_request = requests.Session.request
+
+    def fake_make_api_call(client, operation_name, api_params):
+        if operation_name == 'AssumeRole':
+            time.sleep(latency)
+            return {'Credentials': {
+                'AccessKeyId': 'ASIABENCHMARK',
+                'SecretAccessKey': 'bench-secret',
+                'SessionToken': 'bench-session-token',
+                'Expiration': datetime.now(timezone.utc) + TOKEN_LIFETIME,
+            }}
+        if operation_name == 'DescribeCluster':
+            time.sleep(latency)
+            name = api_params['name']
+            return {'cluster': {
+                'name': name,
+                'arn': f'arn:aws:eks:{client.meta.region_name}:{ACCOUNT_ID}:cluster/{name}',
+                'endpoint': endpoint,
+                'status': 'ACTIVE',
+                'certificateAuthority': {'data': CA_DATA},
+            }}
+        if operation_name == 'ListClusters':
+            time.sleep(latency)
+            return {'clusters': []}
+        return make_api_call(client, operation_name, api_params)
+
+    def fake_session_request(session, method, url, *args, **kwargs):
+        host = urlparse(url).hostname
+        if host == AZURE_LOGIN_HOST:
+            time.sleep(latency)
+            return _json_response(url, {
+                'token_type': 'Bearer',
+                'expires_in': str(int(TOKEN_LIFETIME.total_seconds())),
+                'expires_on': str(int(time.time() + TOKEN_LIFETIME.total_seconds())),
+                'access_token': 'eyJ.bench',
+            })
+        if host == AZURE_MANAGEMENT_HOST and method.upper() == 'POST':
+            time.sleep(latency)
+            return _json_response(url, {'kubeconfigs': [{
+                'name': 'clusterUser',
+                'value': base64.b64encode(_kubeconfig(urlparse(url).path.split('/')[-2], endpoint).encode()).decode(),
+            }]})
+        if host == AZURE_MANAGEMENT_HOST:
+            time.sleep(latency)
+            return _json_response(url, {
+                'name': urlparse(url).path.rsplit('/', 1)[-1],
+                'properties': {'fqdn': urlparse(endpoint).hostname},
+            })
+        return session_request(session, method, url, *args, **kwargs)
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(botocore.client.BaseClient, '_make_api_call', fake_make_api_call))
+        stack.enter_context(mock.patch.object(requests.Session, 'request', fake_session_request))
+        stack.enter_context(mock.patch(
+            'google.cloud.container_v1.ClusterManagerClient',
+            lambda *args, **kwargs: _FakeClusterManagerClient(endpoint, latency)
+        ))
+        stack.enter_context(mock.patch(
+            'google.auth.default',
+            lambda *args, **kwargs: (_FakeGoogleCredentials(latency), 'bench-project')
+        ))
+        yield
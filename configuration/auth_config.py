@@ -1,45 +1,121 @@
-import base64
+import hashlib
 import logging
 import os
-import time
+import re
+import stat
+import tempfile
+import threading
 from pathlib import Path
-from tempfile import NamedTemporaryFile
 
-import boto3
-import google.auth
-import google.auth.transport.requests
-from google.cloud import container_v1
+import yaml
 from jinja2 import FileSystemLoader, Environment
-from kubernetes import client as kubernetes_client
-
-from configuration.aws.aws_assume_role_manager import AWSAssumeRoleManager
-from configuration import get_token
-
-logging.basicConfig(level=logging.INFO)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
 BASE_DIR = Path(__file__).resolve().parent
+KUBECONFIG_TEMPLATE = 'config.yaml.j2'
+AZURE_KUBECONFIG_TEMPLATE = 'azure/azure.yaml.j2'
+# Per user, kubeconfigs carry bearer tokens and must never live in a shared, predictable directory.
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'kubeconfig-cache'
+)
+
+OUTPUT_PATH = 'path'
+OUTPUT_BYTES = 'bytes'
+OUTPUT_DICT = 'dict'
+
+# Templates are compiled on first use and kept for the life of the process.
+_environment = Environment(loader=FileSystemLoader(BASE_DIR), auto_reload=False)
+_written_lock = threading.Lock()
+_written = dict()
+
+
+def render_kubeconfig(config: dict, template_name: str = KUBECONFIG_TEMPLATE) -> bytes:
+    return _environment.get_template(template_name).render(config).encode()
+
+
+def load_kubeconfig(config: dict, template_name: str = KUBECONFIG_TEMPLATE) -> dict:
+    return yaml.safe_load(render_kubeconfig(config, template_name=template_name))
+
+
+def _ensure_private_directory(path: str):
+    """
+    Create path with mode 0700, or make sure an existing one belongs to the current user and is 0700.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise Exception(f'Kubeconfig cache directory {path} is owned by uid {st.st_uid}, not by the current user.')
+    if hasattr(os, 'getuid') and stat.S_IMODE(st.st_mode) != 0o700:
+        raise Exception(f'Kubeconfig cache directory {path} has mode {stat.S_IMODE(st.st_mode):o}, expected 700.')
+
+
+def _file_digest(path: str):
+    try:
+        with open(path, 'rb') as fh:
+            return hashlib.sha256(fh.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def write_kubeconfig(config: dict, template_name: str = KUBECONFIG_TEMPLATE, cache_dir: str = None) -> str:
+    """
+    Write the cluster's kubeconfig to cache_dir and return its path.
+    The file is named after the cluster and rewritten only when its content changes, also across processes.
+    cache_dir must belong to the current user with mode 0700.
+    """
+    content = render_kubeconfig(config, template_name=template_name)
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    path = os.path.join(cache_dir, '%s.yaml' % re.sub(r'[^A-Za-z0-9_.-]', '_', config['name']))
+    digest = hashlib.sha256(content).hexdigest()
+    with _written_lock:
+        if _written.get(path) == digest and os.path.exists(path):
+            return path
+        _ensure_private_directory(cache_dir)
+        if _file_digest(path) == digest:
+            _written[path] = digest
+            return path
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(content)
+        os.replace(tmp_path, path)
+        _written[path] = digest
+    logger.info(f'Created config file at {path}')
+    return path
 
 
-def get_auth_config_path_for_gcp(project_id, cluster_id, zone=None, region=None, return_config=False):
-    location = region
-    if zone:
-        location = zone
+def _render_output(config: dict, output: str, template_name: str = KUBECONFIG_TEMPLATE, cache_dir: str = None):
+    if output == OUTPUT_BYTES:
+        return render_kubeconfig(config, template_name=template_name)
+    if output == OUTPUT_DICT:
+        return load_kubeconfig(config, template_name=template_name)
+    if output == OUTPUT_PATH:
+        return write_kubeconfig(config, template_name=template_name, cache_dir=cache_dir)
+    raise Exception(
+        f'Unsupported output {output}. Supported output {OUTPUT_PATH} or {OUTPUT_BYTES} or {OUTPUT_DICT}.'
+    )
+
+
+def get_auth_config_path_for_gcp(
+        project_id,
+        cluster_id,
+        zone=None,
+        region=None,
+        return_config=False,
+        output=OUTPUT_PATH,
+        cache_dir=None
+):
+    from configuration.gcp.gke import get_cluster_metadata, get_location, google_credentials
+
+    location = get_location(zone=zone, region=region)
     logger.info('Attempting to init k8s client from cluster response.')
-    container_client = container_v1.ClusterManagerClient()
-    logger.info(f'Attempting to get cluster {cluster_id} in project {project_id} in region/zone {location}.')
-    response = container_client.get_cluster(name=f"/{project_id}/locations/{location}/clusters/{cluster_id}")
-    certificate_authority_data = response.master_auth.cluster_ca_certificate
+    metadata = get_cluster_metadata(project_id, location, cluster_id)
+    certificate_authority_data = metadata['certificate_authority_data']
     name = f'gke_{project_id}_{location}_{cluster_id}'
-    host = f'https://{response.endpoint}'
-    creds, projects = google.auth.default(
-        scopes=['https://www.googleapis.com/auth/cloud-platform']
-    )
-    auth_req = google.auth.transport.requests.Request()
-    creds.refresh(auth_req)
-    token = creds.token
+    host = f'https://{metadata["endpoint"]}'
+    token = google_credentials.get_token()
     config = {
         'certificate_authority_data': certificate_authority_data,
         'host': host,
@@ -49,41 +125,27 @@ def get_auth_config_path_for_gcp(project_id, cluster_id, zone=None, region=None,
     if return_config:
         return config
 
-    configuration = kubernetes_client.Configuration()
-    logger.info(f'Found endpoint {response.endpoint}')
-    configuration.host = f'https://{response.endpoint}'
-    with NamedTemporaryFile(delete=False) as ca_cert:
-        ca_cert.write(
-            base64.b64decode(response.master_auth.cluster_ca_certificate)
-        )
-    configuration.ssl_ca_cert = ca_cert.name
-    configuration.api_key_prefix['authorization'] = 'Bearer'
-    configuration.api_key['authorization'] = creds.token
-
+    logger.info(f'Found endpoint {metadata["endpoint"]}')
     logger.info('Received token')
-    template_path = os.path.join(BASE_DIR)
-    loader = FileSystemLoader(template_path)
-    env = Environment(loader=loader)
-    template = env.get_template('config.yaml.j2')
-    template_output = template.render(config)
-    rendered_yaml_path = os.path.join(template_path, f'template_{time.time()}.yaml')
-    with open(rendered_yaml_path, 'w') as fh:
-        fh.write(template_output)
-    logger.info(f'Created config file at {rendered_yaml_path}')
-    # redis_conn.set(rkey, rendered_yaml_path, 60 * 60 * 24)
-    return rendered_yaml_path
-
-
-def get_auth_config_path_for_aws(cluster_id, region, iam_role_arn, return_config=False, external_id=None):
+    return _render_output(config, output=output, cache_dir=cache_dir)
+
+
+def get_auth_config_path_for_aws(
+        cluster_id,
+        region,
+        iam_role_arn,
+        return_config=False,
+        external_id=None,
+        output=OUTPUT_PATH,
+        cache_dir=None
+):
+    from configuration.aws.eks import eks_clusters, get_token
+
     logger.info(f'Attempting to init k8s client from cluster response. external_id {external_id}.')
-    cross_credentials = AWSAssumeRoleManager(role_arn=iam_role_arn, external_id=external_id)
-    s = boto3.Session(region_name=region, **cross_credentials.get_response_for_boto3())
-    eks = s.client("eks")
-    # get cluster details
-    cluster = eks.describe_cluster(name=cluster_id)
-    certificate_authority_data = cluster["cluster"]["certificateAuthority"]["data"]
-    host = cluster["cluster"]["endpoint"]
-    name = cluster['cluster']['arn']
+    cluster = eks_clusters.describe(region, iam_role_arn, cluster_id, external_id=external_id)
+    certificate_authority_data = cluster["certificate_authority_data"]
+    host = cluster["endpoint"]
+    name = cluster['arn']
     logger.info(f"Retrieved all parameters, external_id: {external_id}.")
     token = get_token(cluster_name=cluster_id, role_arn=iam_role_arn, external_id=external_id)['status']['token']
     config = {
@@ -94,12 +156,31 @@ def get_auth_config_path_for_aws(cluster_id, region, iam_role_arn, return_config
     }
     if return_config:
         return config
-    template_path = os.path.join(BASE_DIR)
-    loader = FileSystemLoader(template_path)
-    env = Environment(loader=loader)
-    template = env.get_template('config.yaml.j2')
-    template_output = template.render(config)
-    rendered_yaml_path = os.path.join(template_path, f'template_{time.time()}.yaml')
-    with open(rendered_yaml_path, 'w') as fh:
-        fh.write(template_output)
-    return rendered_yaml_path
+    return _render_output(config, output=output, cache_dir=cache_dir)
+
+
+def get_auth_config_path_for_azure(
+        tenant_id: str,
+        client_id: str,
+        client_secret: str,
+        resource_group: str,
+        cluster_name: str,
+        subscription_id: str,
+        return_config=False,
+        output=OUTPUT_PATH,
+        cache_dir=None
+):
+    from configuration.azure.azure_config import get_azure_kubernetes_config
+
+    config = get_azure_kubernetes_config(
+        tenant_id=tenant_id,
+        client_id=client_id,
+        client_secret=client_secret,
+        resource_group=resource_group,
+        cluster_name=cluster_name,
+        subscription_id=subscription_id,
+        k8config=False
+    )
+    if return_config:
+        return config
+    return _render_output(config, output=output, template_name=AZURE_KUBECONFIG_TEMPLATE, cache_dir=cache_dir)
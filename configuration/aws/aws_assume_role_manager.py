@@ -1,6 +1,7 @@
-import boto3
 import logging
 
+from configuration.aws.credentials import credential_provider
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
@@ -12,21 +13,7 @@ class AWSAssumeRoleManager:
 
     def __init__(self, role_arn, external_id=None):
         logger.info(f'AWSAssumeRoleManager: Found external id to {external_id}')
-        __stsClient = boto3.client('sts')
-        if external_id:
-            logger.info(f'AWSAssumeRoleManager: Assuming using external id.')
-            __assumed_role_object = __stsClient.assume_role(
-                RoleArn=role_arn,
-                RoleSessionName="AssumeRoleSession",
-                ExternalId=external_id
-            )
-        else:
-            logger.info(f'AWSAssumeRoleManager: Assuming using without external id.')
-            __assumed_role_object = __stsClient.assume_role(
-                RoleArn=role_arn,
-                RoleSessionName="AssumeRoleSession",
-            )
-        self.__credentials = __assumed_role_object['Credentials']
+        self.__credentials = credential_provider.get_credentials(role_arn=role_arn, external_id=external_id)
 
     @property
     def get_access_key(self) -> str:
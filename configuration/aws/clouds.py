@@ -1,5 +1,8 @@
-from configuration import get_aws_kube_configuration, get_kube_configuration
-from configuration.azure.azure_config import get_azure_kubernetes_config
+from configuration.cache import (
+    get_cached_aws_kube_configuration,
+    get_cached_kube_configuration,
+    get_cached_azure_kubernetes_config
+)
 
 
 def _get_configuration(cloud_type):
@@ -7,7 +10,7 @@ def _get_configuration(cloud_type):
         """
         AWS Kubernetes Configuration
         """
-        configuration = get_aws_kube_configuration(
+        configuration = get_cached_aws_kube_configuration(
             iam_role_arn="iam_role_arn",
             cluster_id="kube_cluster_name",
             region="region",
@@ -17,20 +20,32 @@ def _get_configuration(cloud_type):
         """
         GCP Kubernetes Configuration
         """
-        configuration = get_kube_configuration(
+        configuration = get_cached_kube_configuration(
             project_id="project_id",
             cluster_id="kube_cluster_name",
             zone="zone",
             region="region"
         )
     elif cloud_type == "AZURE":
-        configuration = get_azure_kubernetes_config(
+        configuration = get_cached_azure_kubernetes_config(
             tenant_id="tenant_id",
             client_id="client_id",
             client_secret="client_secret",
             resource_group="resource_group",
             cluster_name="kube_cluster_name",
-            subscription_id="subscription_id",
-            k8config=True
+            subscription_id="subscription_id"
         )
     return configuration
+
+
+def get_configuration(cloud_type, **params):
+    """
+    Kubernetes Configuration for any cloud, params are passed to the cloud's cached builder.
+    """
+    if cloud_type == "AWS":
+        return get_cached_aws_kube_configuration(**params)
+    elif cloud_type == "GCP":
+        return get_cached_kube_configuration(**params)
+    elif cloud_type == "AZURE":
+        return get_cached_azure_kubernetes_config(**params)
+    raise Exception(f'Unsupported cloud type {cloud_type}. Supported cloud type AWS or GCP or AZURE.')
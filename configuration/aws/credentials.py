@@ -0,0 +1,98 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import boto3
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+ROLE_SESSION_NAME = 'AssumeRoleSession'
+REFRESH_AHEAD = timedelta(minutes=5)  # Refresh in background once credentials are this close to Expiration
+EXPIRY_MARGIN = timedelta(minutes=1)  # Never hand out credentials this close to Expiration
+
+
+class AssumeRoleCredentialProvider:
+    """
+    Cache temporary credentials from sts.assume_role by (role_arn, external_id).
+    Credentials are reused until shortly before their Expiration and refreshed ahead of time in the background,
+    so concurrent callers for the same role share a single assume_role call.
+    """
+
+    def __init__(self, refresh_ahead: timedelta = REFRESH_AHEAD, expiry_margin: timedelta = EXPIRY_MARGIN):
+        self.__refresh_ahead = refresh_ahead
+        self.__expiry_margin = expiry_margin
+        self.__lock = threading.Lock()
+        self.__credentials = dict()
+        self.__key_locks = dict()
+        self.__refreshing = set()
+        self.__sts_client = None
+
+    def get_credentials(self, role_arn: str, external_id=None) -> dict:
+        """
+        Returns the Credentials dict of sts.assume_role: AccessKeyId, SecretAccessKey, SessionToken, Expiration
+        """
+        key = (role_arn, external_id)
+        credentials = self.__credentials.get(key)
+        if credentials is not None:
+            remaining = credentials['Expiration'] - datetime.now(timezone.utc)
+            if remaining > self.__refresh_ahead:
+                return credentials
+            if remaining > self.__expiry_margin:
+                self.__refresh_in_background(key)
+                return credentials
+        with self.__get_key_lock(key):
+            credentials = self.__credentials.get(key)
+            if credentials is None or not self.__is_usable(credentials):
+                credentials = self.__assume_role(role_arn, external_id)
+            return credentials
+
+    def invalidate(self, role_arn: str, external_id=None):
+        with self.__lock:
+            self.__credentials.pop((role_arn, external_id), None)
+
+    def __is_usable(self, credentials) -> bool:
+        return credentials['Expiration'] - datetime.now(timezone.utc) > self.__expiry_margin
+
+    def __get_key_lock(self, key) -> threading.Lock:
+        with self.__lock:
+            return self.__key_locks.setdefault(key, threading.Lock())
+
+    def __get_sts_client(self):
+        with self.__lock:
+            if self.__sts_client is None:
+                self.__sts_client = boto3.client('sts')
+            return self.__sts_client
+
+    def __assume_role(self, role_arn, external_id) -> dict:
+        params = dict(RoleArn=role_arn, RoleSessionName=ROLE_SESSION_NAME)
+        if external_id:
+            logger.info(f'AssumeRoleCredentialProvider: Assuming {role_arn} using external id.')
+            params['ExternalId'] = external_id
+        else:
+            logger.info(f'AssumeRoleCredentialProvider: Assuming {role_arn} without external id.')
+        credentials = self.__get_sts_client().assume_role(**params)['Credentials']
+        with self.__lock:
+            self.__credentials[(role_arn, external_id)] = credentials
+        return credentials
+
+    def __refresh_in_background(self, key):
+        with self.__lock:
+            if key in self.__refreshing:
+                return
+            self.__refreshing.add(key)
+        thread = threading.Thread(target=self.__refresh, args=key, daemon=True)
+        thread.start()
+
+    def __refresh(self, role_arn, external_id):
+        try:
+            with self.__get_key_lock((role_arn, external_id)):
+                self.__assume_role(role_arn, external_id)
+        except Exception as e:
+            logger.error(f'AssumeRoleCredentialProvider: Background refresh failed for {role_arn}: {e}')
+        finally:
+            with self.__lock:
+                self.__refreshing.discard((role_arn, external_id))
+
+
+credential_provider = AssumeRoleCredentialProvider()
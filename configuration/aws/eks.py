@@ -0,0 +1,237 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import boto3
+from awscli.customizations.eks.get_token import TokenGenerator, TOKEN_EXPIRATION_MINS, K8S_AWS_ID_HEADER
+from botocore import session
+from configuration.aws.credentials import credential_provider
+from configuration.ca_store import ca_store
+from configuration.cache import configuration_cache, ConfigurationCache
+from configuration.token_refresh import BearerTokenRefresher
+from kubernetes import client
+from kubernetes.metrics import config_build_step, metrics
+from kubernetes.throttle import add_failure_callback
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+CLUSTER_METADATA_TTL = 30 * 60  # Seconds, endpoint and CA of a cluster practically never change
+DEFAULT_WARM_WORKERS = 16
+
+
+class STSClientFactory(object):
+    def __init__(self, session):
+        self._session = session
+
+    def get_sts_client(self, region_name=None, role_arn=None, external_id=None):
+        client_kwargs = {'region_name': region_name}
+        if role_arn is not None:
+            creds = self._get_role_credentials(region_name, role_arn, external_id)
+            client_kwargs['aws_access_key_id'] = creds['AccessKeyId']
+            client_kwargs['aws_secret_access_key'] = creds['SecretAccessKey']
+            client_kwargs['aws_session_token'] = creds['SessionToken']
+        sts = self._session.create_client('sts', **client_kwargs)
+        self._register_k8s_aws_id_handlers(sts)
+        return sts
+
+    def _get_role_credentials(self, region_name, role_arn, external_id):
+        logger.info(f'_get_role_credentials with {external_id}')
+        return credential_provider.get_credentials(role_arn=role_arn, external_id=external_id)
+
+    def _register_k8s_aws_id_handlers(self, sts_client):
+        sts_client.meta.events.register(
+            'provide-client-params.sts.GetCallerIdentity',
+            self._retrieve_k8s_aws_id,
+        )
+        sts_client.meta.events.register(
+            'before-sign.sts.GetCallerIdentity',
+            self._inject_k8s_aws_id_header,
+        )
+
+    def _retrieve_k8s_aws_id(self, params, context, **kwargs):
+        if K8S_AWS_ID_HEADER in params:
+            context[K8S_AWS_ID_HEADER] = params.pop(K8S_AWS_ID_HEADER)
+
+    def _inject_k8s_aws_id_header(self, request, **kwargs):
+        if K8S_AWS_ID_HEADER in request.context:
+            request.headers[K8S_AWS_ID_HEADER] = request.context[K8S_AWS_ID_HEADER]
+
+
+class EKSClusterRegistry:
+    """
+    Endpoint, CA and ARN of EKS clusters cached per (region, role_arn, external_id, cluster_id), described with
+    one long-lived EKS client per (region, role_arn, external_id). A client is rebuilt only once the assumed
+    role's credentials rotate. Entries of a cluster are dropped when its API server fails TLS or authentication,
+    so a moved endpoint or rotated CA is picked up by the next build.
+    """
+
+    def __init__(self, ttl: int = CLUSTER_METADATA_TTL, warm_workers: int = DEFAULT_WARM_WORKERS):
+        self.__ttl = ttl
+        self.__warm_workers = warm_workers
+        self.__lock = threading.Lock()
+        self.__clients = dict()
+        self.__keys_by_host = dict()
+        self.__cache = ConfigurationCache()
+
+    def get_client(self, region: str, role_arn: str, external_id=None):
+        credentials = credential_provider.get_credentials(role_arn=role_arn, external_id=external_id)
+        key = (region, role_arn, external_id)
+        with self.__lock:
+            entry = self.__clients.get(key)
+            if entry is None or entry[0] is not credentials:
+                eks = boto3.Session(
+                    region_name=region,
+                    aws_access_key_id=credentials['AccessKeyId'],
+                    aws_secret_access_key=credentials['SecretAccessKey'],
+                    aws_session_token=credentials['SessionToken']
+                ).client('eks')
+                entry = self.__clients[key] = (credentials, eks)
+            return entry[1]
+
+    def describe(self, region: str, role_arn: str, cluster_id: str, external_id=None) -> dict:
+        """
+        Dict with keys: endpoint, certificate_authority_data, arn
+        """
+        def describe_cluster():
+            with config_build_step('AWS', cluster_id, 'assume_role'):
+                eks = self.get_client(region, role_arn, external_id)
+            with config_build_step('AWS', cluster_id, 'describe_cluster'):
+                cluster = eks.describe_cluster(name=cluster_id)['cluster']
+            return {
+                'endpoint': cluster['endpoint'],
+                'certificate_authority_data': cluster['certificateAuthority']['data'],
+                'arn': cluster['arn'],
+            }
+
+        key = (region, role_arn, external_id, cluster_id)
+        return self.__cache.get(key=key, builder=describe_cluster, ttl=self.__ttl)
+
+    def warm(self, region: str, role_arn: str, external_id=None, cluster_ids: list = None) -> dict:
+        """
+        Describe many clusters of a region concurrently, every cluster of the region when cluster_ids is None.
+        Returns {cluster_id: metadata}, clusters that failed are logged and left out.
+        """
+        if cluster_ids is None:
+            paginator = self.get_client(region, role_arn, external_id).get_paginator('list_clusters')
+            cluster_ids = [name for page in paginator.paginate() for name in page['clusters']]
+        results = dict()
+        with ThreadPoolExecutor(max_workers=self.__warm_workers, thread_name_prefix='eks-warm') as executor:
+            futures = {
+                executor.submit(self.describe, region, role_arn, cluster_id, external_id): cluster_id
+                for cluster_id in cluster_ids
+            }
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    logger.error(f'EKSClusterRegistry: Failed to describe {futures[future]} in {region}: {e}')
+        return results
+
+    def track_host(self, host: str, region: str, role_arn: str, cluster_id: str, external_id=None):
+        with self.__lock:
+            self.__keys_by_host.setdefault(host, set()).add((region, role_arn, external_id, cluster_id))
+
+    def invalidate(self, region: str, role_arn: str, cluster_id: str, external_id=None):
+        self.__cache.invalidate((region, role_arn, external_id, cluster_id))
+
+    def invalidate_host(self, host: str):
+        with self.__lock:
+            keys = self.__keys_by_host.pop(host, ())
+        for key in keys:
+            self.__cache.invalidate(key)
+
+    def clear(self):
+        self.__cache.clear()
+
+
+eks_clusters = EKSClusterRegistry()
+
+
+def _on_api_failure(host, reason, error):
+    logger.info(f'EKSClusterRegistry: Dropping cached metadata and configurations of {host} after {reason} failure.')
+    eks_clusters.invalidate_host(host)
+    configuration_cache.invalidate_host(host)
+
+
+add_failure_callback(_on_api_failure)
+
+
+def get_expiration_time():
+    token_expiration = datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRATION_MINS)
+    return token_expiration.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def get_token(cluster_name: str, role_arn: str = None, external_id=None) -> dict:
+    work_session = session.get_session()
+    client_factory = STSClientFactory(work_session)
+    sts_client = client_factory.get_sts_client(role_arn=role_arn, external_id=external_id)
+    token = TokenGenerator(sts_client).get_token(cluster_name)
+    return {
+        "kind": "ExecCredential",
+        "apiVersion": "client.authentication.k8s.io/v1alpha1",
+        "spec": {},
+        "status": {
+            "expirationTimestamp": get_expiration_time(),
+            "token": token
+        }
+    }
+
+
+def _fetch_token(cluster_id: str, role_arn: str, external_id=None, force_refresh=False) -> tuple:
+    if force_refresh:
+        # The API server rejected a token signed with these credentials, assume the role again.
+        credential_provider.invalidate(role_arn=role_arn, external_id=external_id)
+    token = get_token(cluster_name=cluster_id, role_arn=role_arn, external_id=external_id)['status']['token']
+    return token, time.time() + TOKEN_EXPIRATION_MINS * 60
+
+
+def get_aws_kube_configuration(
+        iam_role_arn: str,
+        cluster_id: str,
+        region,
+        external_id=None,
+        return_configuration_dict=False,
+        vpc_endpoint_address=None
+):
+    logger.info(f'Attempting to init k8s client from cluster response. external_id {external_id}.')
+    cluster = eks_clusters.describe(region, iam_role_arn, cluster_id, external_id=external_id)
+    certificate_authority_data = cluster["certificate_authority_data"]
+
+    """
+    For private VPC use vpc_endpoint_address as a host instead of EKS cluster host.
+    """
+    if not vpc_endpoint_address:
+        host = cluster["endpoint"]
+    else:
+        logger.info(f'Found vpc_endpoint_address, using it as host in K8 config.')
+        host = vpc_endpoint_address
+    name = cluster['arn']
+    logger.info(f"Retrieved all parameters, external_id: {external_id}.")
+    with config_build_step('AWS', cluster_id, 'get_token'):
+        token, expires_at = _fetch_token(cluster_id, iam_role_arn, external_id=external_id)
+    metrics.register_cluster(host, 'AWS', cluster_id)
+    eks_clusters.track_host(host, region, iam_role_arn, cluster_id, external_id=external_id)
+    configuration = client.Configuration()
+    configuration.host = host
+
+    config = {
+        'certificate_authority_data': certificate_authority_data,
+        'host': host,
+        'name': name,
+        'token': token,
+    }
+    if return_configuration_dict:
+        return config
+    ca_store.attach(configuration, certificate_authority_data)
+    if vpc_endpoint_address:
+        configuration.verify_ssl = False
+    refresher = BearerTokenRefresher(
+        lambda force_refresh: _fetch_token(
+            cluster_id, iam_role_arn, external_id=external_id, force_refresh=force_refresh
+        ),
+        identity=('AWS', iam_role_arn, external_id, region, cluster_id)
+    )
+    return refresher.attach(configuration, token, expires_at)
@@ -0,0 +1,147 @@
+"""
+kubectl and client-go exec credential plugin for EKS. Prints the ExecCredential of a cluster, reusing a token from
+an on-disk cache shared by every process of the user until shortly before its expirationTimestamp, so hundreds of
+kubectl calls sign with STS only once per token lifetime. Cache hits never import boto3 or awscli.
+
+    python -m configuration.aws.exec_credential --cluster-name my-cluster --role-arn arn:aws:iam::123456789012:role/x
+
+kubeconfig user entry:
+
+    users:
+    - name: my-cluster
+      user:
+        exec:
+          apiVersion: client.authentication.k8s.io/v1beta1
+          command: python
+          args: [-m, configuration.aws.exec_credential, --cluster-name, my-cluster, --role-arn, arn:aws:iam::...]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger()
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.kube', 'cache', 'cloud-connection-exec')
+DEFAULT_API_VERSION = 'client.authentication.k8s.io/v1beta1'
+EXPIRY_MARGIN = timedelta(minutes=1)  # Never hand out a token this close to its expirationTimestamp
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+class ExecCredentialCache:
+    """
+    ExecCredentials stored as one 0600 JSON file per (cluster, role, external id) in a 0700 directory.
+    Readers and writers of an entry hold an exclusive fcntl lock on its lock file, so concurrent processes missing
+    the same entry generate a single token. Without fcntl (Windows) the cache works unlocked.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, expiry_margin: timedelta = EXPIRY_MARGIN):
+        self.__cache_dir = cache_dir
+        self.__expiry_margin = expiry_margin
+
+    def path(self, key: tuple) -> str:
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.__cache_dir, f'{digest}.json')
+
+    @contextmanager
+    def locked(self, key: tuple):
+        os.makedirs(self.__cache_dir, mode=0o700, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.path(key) + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def read(self, key: tuple):
+        """
+        The cached ExecCredential, None when missing, unreadable or too close to expiry.
+        """
+        try:
+            with open(self.path(key)) as fh:
+                credential = json.load(fh)
+            expiration = datetime.strptime(credential['status']['expirationTimestamp'], TIMESTAMP_FORMAT)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if expiration.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc) <= self.__expiry_margin:
+            return None
+        return credential
+
+    def write(self, key: tuple, credential: dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.__cache_dir)
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(credential, fh)
+        os.replace(tmp_path, self.path(key))
+
+    def get(self, key: tuple, builder) -> dict:
+        with self.locked(key):
+            credential = self.read(key)
+            if credential is None:
+                credential = builder()
+                self.write(key, credential)
+            return credential
+
+
+def get_exec_credential(
+        cluster_name: str,
+        role_arn: str = None,
+        external_id=None,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        use_cache: bool = True,
+        api_version: str = DEFAULT_API_VERSION
+) -> dict:
+    def build():
+        from configuration.aws.eks import get_token
+
+        return get_token(cluster_name=cluster_name, role_arn=role_arn, external_id=external_id)
+
+    if use_cache:
+        credential = ExecCredentialCache(cache_dir=cache_dir).get((cluster_name, role_arn, external_id), build)
+    else:
+        credential = build()
+    return dict(credential, apiVersion=api_version)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Print an EKS ExecCredential for kubectl and client-go.')
+    parser.add_argument('--cluster-name', required=True)
+    parser.add_argument('--role-arn')
+    parser.add_argument('--external-id')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help='Always sign a new token')
+    parser.add_argument('--api-version', default=DEFAULT_API_VERSION, help='Must match the kubeconfig exec apiVersion')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # stdout carries the credential, keep the library's INFO logs off stderr too.
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.WARNING)
+    credential = get_exec_credential(
+        cluster_name=args.cluster_name,
+        role_arn=args.role_arn,
+        external_id=args.external_id,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        api_version=args.api_version
+    )
+    sys.stdout.write(json.dumps(credential) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
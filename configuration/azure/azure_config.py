@@ -1,28 +1,163 @@
-import base64
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+import base64
 import requests
 import logging
+import threading
+import time
 import kubernetes.client  # Update these to auth as your Azure AD App
 
-from azure.mgmt.containerservice import ContainerServiceClient
-from azure.identity import ClientSecretCredential
 import yaml
+from requests.adapters import HTTPAdapter
+
+from configuration.ca_store import ca_store
+from configuration.cache import ConfigurationCache
+from configuration.token_refresh import BearerTokenRefresher
+from kubernetes.metrics import config_build_step, metrics
 
 BASE_DIR = Path(__file__).resolve().parent
 
+LOGIN_URL = 'https://login.microsoftonline.com/%s/oauth2/token'
+MANAGEMENT_URL = 'https://management.azure.com'
+MANAGED_CLUSTERS_API_VERSION = '2022-11-01'
+# magic resource ID that works for all AKS clusters
+AKS_RESOURCE_ID = '6dae42f8-4368-4678-94ff-3960e28e3630'
+TOKEN_EXPIRY_MARGIN = 5 * 60  # Seconds, never hand out a token this close to expires_on
+CLUSTER_METADATA_TTL = 10 * 60  # Seconds
+POOL_MAXSIZE = 32
+MAX_WORKERS = 8
+
+# One keep-alive pool for Azure AD and the management plane, shared by every build of the process.
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_maxsize=POOL_MAXSIZE))
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='azure-config')
+
+
+class OAuthTokenCache:
+    """
+    Azure AD client credential tokens cached per (tenant_id, client_id, resource) until shortly before expires_on.
+    Concurrent callers for the same key share a single token request.
+    """
+
+    def __init__(self, expiry_margin: int = TOKEN_EXPIRY_MARGIN):
+        self.__expiry_margin = expiry_margin
+        self.__lock = threading.Lock()
+        self.__tokens = dict()
+        self.__key_locks = dict()
+
+    def get(self, resource: str, tenant_id: str, client_id: str, client_secret: str) -> str:
+        return self.get_with_expiry(resource, tenant_id, client_id, client_secret)[0]
+
+    def get_with_expiry(self, resource: str, tenant_id: str, client_id: str, client_secret: str) -> tuple:
+        """
+        (access_token, expires_on) with expires_on in epoch seconds.
+        """
+        key = (tenant_id, client_id, resource)
+        token = self.__tokens.get(key)
+        if token is not None and self.__is_usable(token):
+            return token
+        with self.__get_key_lock(key):
+            token = self.__tokens.get(key)
+            if token is None or not self.__is_usable(token):
+                token = self.__request_token(resource, tenant_id, client_id, client_secret)
+                with self.__lock:
+                    self.__tokens[key] = token
+            return token
+
+    def invalidate(self, resource: str, tenant_id: str, client_id: str):
+        with self.__lock:
+            self.__tokens.pop((tenant_id, client_id, resource), None)
+
+    def clear(self):
+        with self.__lock:
+            self.__tokens.clear()
+
+    def __is_usable(self, token) -> bool:
+        return token[1] - time.time() > self.__expiry_margin
+
+    def __get_key_lock(self, key) -> threading.Lock:
+        with self.__lock:
+            return self.__key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def __request_token(resource, tenant_id, client_id, client_secret) -> tuple:
+        payload = {
+            'grant_type': 'client_credentials',
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'Content-Type': 'x-www-form-urlencoded',
+            'resource': resource
+        }
+        response = _session.post(LOGIN_URL % tenant_id, data=payload, verify=False).json()
+        if 'access_token' not in response:
+            raise Exception(
+                f'Failed to get OAuth token for {resource}: {response.get("error_description") or response.get("error")}'
+            )
+        logging.info(f'Got OAuth token for {resource}')
+        expires_on = response.get('expires_on')
+        if expires_on is None:
+            expires_on = time.time() + float(response.get('expires_in', 0))
+        return response['access_token'], float(expires_on)
+
+
+token_cache = OAuthTokenCache()
+# Endpoint, CA and kubeconfig server per (tenant_id, client_id, subscription_id, resource_group, cluster_name).
+cluster_metadata_cache = ConfigurationCache()
+
+
 def get_oauth_token(resource, tenant_id, client_id, client_secret):
-    login_url = 'https://login.microsoftonline.com/%s/oauth2/token' % tenant_id
-    payload = {
-        'grant_type': 'client_credentials',
-        'client_id': client_id,
-        'client_secret': client_secret,
-        'Content-Type': 'x-www-form-urlencoded',
-        'resource': resource
+    return token_cache.get(resource=resource, tenant_id=tenant_id, client_id=client_id, client_secret=client_secret)
+
+
+def _get_managed_cluster(url, token, cluster_name) -> dict:
+    with config_build_step('AZURE', cluster_name, 'get_managed_cluster'):
+        response = _session.get(
+            url,
+            params={'api-version': MANAGED_CLUSTERS_API_VERSION, 'PropertyName': 'properties.certificate'},
+            headers={'Authorization': 'Bearer %s' % token}
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+def _list_cluster_user_credentials(url, token, cluster_name) -> dict:
+    with config_build_step('AZURE', cluster_name, 'list_cluster_user_credentials'):
+        response = _session.post(
+            url + '/listClusterUserCredential',
+            params={'api-version': MANAGED_CLUSTERS_API_VERSION},
+            headers={'Authorization': 'Bearer %s' % token}
+        )
+        response.raise_for_status()
+        kubeconfig = base64.b64decode(response.json()['kubeconfigs'][0]['value']).decode('utf-8')
+        return yaml.safe_load(kubeconfig)
+
+
+def _get_cluster_metadata(token, resource_group, cluster_name, subscription_id) -> dict:
+    url = MANAGEMENT_URL + '/subscriptions/%s' % subscription_id
+    url += '/resourceGroups/%s' % resource_group
+    url += '/providers/Microsoft.ContainerService/managedClusters/%s' % cluster_name
+    # Both calls only need the management token, run them side by side.
+    cluster_future = _executor.submit(_get_managed_cluster, url, token, cluster_name)
+    kubeconfig_future = _executor.submit(_list_cluster_user_credentials, url, token, cluster_name)
+    props = cluster_future.result()['properties']
+    kube_cluster = kubeconfig_future.result().get('clusters')[0]
+    return {
+        'fqdn': props.get('fqdn') or props.get('privateFQDN'),
+        'certificate_authority_data': kube_cluster.get('cluster').get('certificate-authority-data'),
+        'server': kube_cluster.get('cluster').get('server'),
+        'name': kube_cluster.get('name'),
     }
-    response = requests.post(login_url, data=payload, verify=False).json()
-    logging.info('Got OAuth token for AKS')
-    return response['access_token']
+
+
+def _get_token_in_step(resource, step, tenant_id, client_id, client_secret, cluster_name):
+    with config_build_step('AZURE', cluster_name, step):
+        return token_cache.get_with_expiry(resource, tenant_id, client_id, client_secret)
+
+
+def _fetch_api_token(tenant_id, client_id, client_secret, force_refresh=False) -> tuple:
+    if force_refresh:
+        token_cache.invalidate(AKS_RESOURCE_ID, tenant_id, client_id)
+    return token_cache.get_with_expiry(AKS_RESOURCE_ID, tenant_id, client_id, client_secret)
 
 
 def get_azure_kubernetes_config(
@@ -34,76 +169,47 @@ def get_azure_kubernetes_config(
         subscription_id: str,
         k8config=True
 ):
-    logging.info('Retrieving cluster endpoint…')
-    token = get_oauth_token(
-        resource='https://management.azure.com',
-        tenant_id=tenant_id,
-        client_id=client_id,
-        client_secret=client_secret
-    )
-    mgmt_url = 'https://management.azure.com/subscriptions/%s' % subscription_id
-    mgmt_url += '/resourceGroups/%s' % resource_group
-    mgmt_url += '/providers/Microsoft.ContainerService/managedClusters/%s' % cluster_name
-    cluster = requests.get(
-        mgmt_url,
-        params={'api-version': '2022-11-01', 'PropertyName': 'properties.certificate'},
-        headers={'Authorization': 'Bearer %s' % token}
-    ).json()
-
-    props = cluster['properties']
-    fqdn = props.get('fqdn') or props.get('privateFQDN')
-    api_endpoint = 'https://%s:443' % fqdn
-    logging.info('Got cluster endpoint', endpoint=api_endpoint)
-
-    logging.info('Requesting OAuth token for AKS…')
-    # magic resource ID that works for all AKS clusters
-    AKS_RESOURCE_ID = '6dae42f8-4368-4678-94ff-3960e28e3630'
-    api_token = get_oauth_token(
-        resource=AKS_RESOURCE_ID,
-        tenant_id=tenant_id,
-        client_id=client_id,
-        client_secret=client_secret
+    credentials = dict(tenant_id=tenant_id, client_id=client_id, client_secret=client_secret)
+    # The API token is independent of the cluster metadata, request it up front. The management token is only needed
+    # on a metadata cache miss, and is then fetched while the API token request is in flight.
+    api_token_future = _executor.submit(
+        _get_token_in_step, AKS_RESOURCE_ID, 'aks_token', cluster_name=cluster_name, **credentials
     )
-
-    credential = ClientSecretCredential(
-        tenant_id=tenant_id,
-        client_id=client_id,
-        client_secret=client_secret
-    )
-
-    client = ContainerServiceClient(
-        credential=credential,
-        subscription_id=subscription_id
+    logging.info('Retrieving cluster endpoint…')
+    metadata = cluster_metadata_cache.get(
+        # Per principal, one without access to the cluster must not get metadata another principal fetched.
+        key=(tenant_id, client_id, subscription_id, resource_group, cluster_name),
+        builder=lambda: _get_cluster_metadata(
+            token=_get_token_in_step(MANAGEMENT_URL, 'management_token', cluster_name=cluster_name, **credentials)[0],
+            resource_group=resource_group,
+            cluster_name=cluster_name,
+            subscription_id=subscription_id
+        ),
+        ttl=CLUSTER_METADATA_TTL
     )
-
-    result = client.managed_clusters.list_cluster_user_credentials(
-        resource_group, cluster_name
-    ).kubeconfigs[0]
-    kubeconfig: str = result.value.decode("utf-8")
-    d = yaml.safe_load(kubeconfig)
-    cert = d.get('clusters')[0].get('cluster').get('certificate-authority-data')
-    server = d.get('clusters')[0].get('cluster').get('server')
-    cluster_name = d.get('clusters')[0].get('name')
+    api_endpoint = 'https://%s:443' % metadata['fqdn']
+    logging.info(f'Got cluster endpoint {api_endpoint}')
+    api_token, api_token_expires_on = api_token_future.result()
+    cert = metadata['certificate_authority_data']
+    server = metadata['server']
+    cluster_name = metadata['name']
     user = f'clusterUser_{resource_group}_{cluster_name}'
-    with NamedTemporaryFile(delete=False) as ca_cert:
-        ca_cert.write(
-            base64.b64decode(cert)
-        )
-    logging.info('Building K8s API client')
-    configuration = kubernetes.client.Configuration()
-    configuration.api_key['authorization'] = api_token
-    configuration.api_key_prefix['authorization'] = 'Bearer'
-    configuration.host = api_endpoint
-    configuration.verify_ssl = True
-    configuration.ssl_ca_cert = ca_cert.name
-    config={
+    metrics.register_cluster(api_endpoint, 'AZURE', cluster_name)
+    if not k8config:
+        return {
             'certificate_authority_data': cert,
             'host': server,
             'user_name': user,
             'name': cluster_name,
             'token': api_token,
         }
-    if k8config:
-        return configuration
-    else:
-        return config
+    logging.info('Building K8s API client')
+    configuration = kubernetes.client.Configuration()
+    BearerTokenRefresher(
+        lambda force_refresh: _fetch_api_token(force_refresh=force_refresh, **credentials),
+        identity=('AZURE', tenant_id, client_id, subscription_id, resource_group, cluster_name)
+    ).attach(configuration, api_token, api_token_expires_on)
+    configuration.host = api_endpoint
+    configuration.verify_ssl = True
+    ca_store.attach(configuration, cert)
+    return configuration
@@ -0,0 +1,96 @@
+import atexit
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+
+class CAPath(str):
+    """
+    Path of a shared CA file. Copies of a Configuration share this object rather than a copy of the string,
+    so the file stays on disk while any of them can still use it.
+    """
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class CAStore:
+    """
+    Content-addressed store of cluster CA bundles keyed by a hash of certificate_authority_data.
+    Each CA is decoded and written to disk once, shared by every Configuration using it, reference counted
+    and removed when its last user is released or at interpreter exit.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__directory = None
+        self.__paths = dict()
+        self.__refcounts = dict()
+
+    @staticmethod
+    def digest(certificate_authority_data) -> str:
+        if isinstance(certificate_authority_data, str):
+            certificate_authority_data = certificate_authority_data.encode()
+        return hashlib.sha256(certificate_authority_data).hexdigest()
+
+    def acquire(self, certificate_authority_data) -> str:
+        """
+        Returns the path of the decoded CA file, writing it on first use.
+        """
+        digest = self.digest(certificate_authority_data)
+        with self.__lock:
+            path = self.__paths.get(digest)
+            if path is None:
+                if self.__directory is None:
+                    self.__directory = tempfile.mkdtemp(prefix='kube-ca-')
+                path = os.path.join(self.__directory, f'{digest}.crt')
+                with open(f'{path}.tmp', 'wb') as fh:
+                    fh.write(base64.b64decode(certificate_authority_data))
+                os.replace(f'{path}.tmp', path)
+                self.__paths[digest] = path
+            self.__refcounts[digest] = self.__refcounts.get(digest, 0) + 1
+            return path
+
+    def release(self, certificate_authority_data):
+        digest = self.digest(certificate_authority_data)
+        with self.__lock:
+            if digest not in self.__refcounts:
+                return
+            self.__refcounts[digest] -= 1
+            if self.__refcounts[digest] > 0:
+                return
+            del self.__refcounts[digest]
+            path = self.__paths.pop(digest)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def attach(self, configuration, certificate_authority_data):
+        """
+        Point configuration.ssl_ca_cert at the shared CA file, released once that path is garbage collected with
+        configuration and all of its copies.
+        """
+        path = CAPath(self.acquire(certificate_authority_data))
+        weakref.finalize(path, self.release, certificate_authority_data)
+        configuration.ssl_ca_cert = path
+
+    def cleanup(self):
+        with self.__lock:
+            directory = self.__directory
+            self.__directory = None
+            self.__paths.clear()
+            self.__refcounts.clear()
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+ca_store = CAStore()
+atexit.register(ca_store.cleanup)
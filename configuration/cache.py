@@ -0,0 +1,218 @@
+import hashlib
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+AWS_CONFIGURATION_TTL = 14 * 60  # Seconds, awscli's TOKEN_EXPIRATION_MINS without importing awscli
+GCP_CONFIGURATION_TTL = 55 * 60  # Seconds, GKE access tokens live for an hour
+AZURE_CONFIGURATION_TTL = 55 * 60  # Seconds, AAD access tokens live for an hour
+REFRESH_BEFORE_EXPIRY = 60  # Seconds
+
+
+class _Entry:
+    def __init__(self):
+        self.value = None
+        self.error = None
+        self.expires_at = 0
+        self.used = False
+        self.timer = None
+        self.ready = threading.Event()
+
+
+class ConfigurationCache:
+    """
+    Process-wide cache of kubernetes Configuration objects keyed by cloud and cluster identity.
+    An entry lives as long as its bearer token and is rebuilt in the background shortly before expiry
+    if it was used since the last build. Concurrent misses for the same key share a single build.
+    Cached Configuration objects are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, refresh_before_expiry: int = REFRESH_BEFORE_EXPIRY):
+        self.__refresh_before_expiry = refresh_before_expiry
+        self.__lock = threading.Lock()
+        self.__entries = dict()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def get(self, key: tuple, builder, ttl: int):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry.ready.is_set() and entry.expires_at > time.monotonic():
+                entry.used = True
+                self.hits += 1
+                return entry.value
+            if entry is not None and not entry.ready.is_set():
+                self.coalesced += 1
+                owner = False
+            else:
+                entry = _Entry()
+                self.__entries[key] = entry
+                self.misses += 1
+                owner = True
+        if not owner:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.value
+        try:
+            entry.value = builder()
+        except Exception as e:
+            entry.error = e
+            with self.__lock:
+                if self.__entries.get(key) is entry:
+                    del self.__entries[key]
+            entry.ready.set()
+            raise
+        self.__store(key, entry, builder, ttl)
+        entry.ready.set()
+        return entry.value
+
+    def __store(self, key, entry, builder, ttl):
+        entry.expires_at = time.monotonic() + ttl
+        delay = max(ttl - self.__refresh_before_expiry, 0)
+        entry.timer = threading.Timer(delay, self.__refresh, args=(key, entry, builder, ttl))
+        entry.timer.daemon = True
+        entry.timer.start()
+
+    def __refresh(self, key, entry, builder, ttl):
+        with self.__lock:
+            if self.__entries.get(key) is not entry:
+                return
+            if not entry.used:
+                # Nobody asked for it during its lifetime, let it lapse instead of refreshing forever.
+                del self.__entries[key]
+                return
+        try:
+            value = builder()
+        except Exception as e:
+            with self.__lock:
+                self.refresh_errors += 1
+            logger.error(f'ConfigurationCache: Background refresh failed for {key[0]} {key[1:]}: {e}')
+            return
+        new_entry = _Entry()
+        new_entry.value = value
+        with self.__lock:
+            if self.__entries.get(key) is not entry:
+                return
+            self.__entries[key] = new_entry
+            self.refreshes += 1
+        self.__store(key, new_entry, builder, ttl)
+        new_entry.ready.set()
+
+    def invalidate(self, key: tuple):
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+        if entry is not None and entry.timer is not None:
+            entry.timer.cancel()
+
+    def invalidate_host(self, host: str) -> int:
+        """
+        Drop every cached Configuration pointing at host, returns how many were dropped.
+        """
+        with self.__lock:
+            keys = [
+                key for key, entry in self.__entries.items()
+                if entry.ready.is_set() and getattr(entry.value, 'host', None) == host
+            ]
+            entries = [self.__entries.pop(key) for key in keys]
+        for entry in entries:
+            if entry.timer is not None:
+                entry.timer.cancel()
+        return len(entries)
+
+    def clear(self):
+        with self.__lock:
+            entries = list(self.__entries.values())
+            self.__entries.clear()
+        for entry in entries:
+            if entry.timer is not None:
+                entry.timer.cancel()
+
+    def stats(self) -> dict:
+        """
+        Dict with keys: hits, misses, coalesced, refreshes, refresh_errors, size
+        """
+        with self.__lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                coalesced=self.coalesced,
+                refreshes=self.refreshes,
+                refresh_errors=self.refresh_errors,
+                size=len(self.__entries)
+            )
+
+
+configuration_cache = ConfigurationCache()
+
+
+def get_cached_aws_kube_configuration(
+        iam_role_arn: str,
+        cluster_id: str,
+        region,
+        external_id=None,
+        vpc_endpoint_address=None
+):
+    from configuration.aws.eks import get_aws_kube_configuration
+
+    return configuration_cache.get(
+        key=('AWS', iam_role_arn, cluster_id, region, external_id, vpc_endpoint_address),
+        builder=lambda: get_aws_kube_configuration(
+            iam_role_arn=iam_role_arn,
+            cluster_id=cluster_id,
+            region=region,
+            external_id=external_id,
+            vpc_endpoint_address=vpc_endpoint_address
+        ),
+        ttl=AWS_CONFIGURATION_TTL
+    )
+
+
+def get_cached_kube_configuration(project_id: str, cluster_id: str, zone=None, region=None):
+    from configuration.gcp.gke import get_kube_configuration
+
+    return configuration_cache.get(
+        key=('GCP', project_id, cluster_id, zone or region),
+        builder=lambda: get_kube_configuration(
+            project_id=project_id,
+            cluster_id=cluster_id,
+            zone=zone,
+            region=region
+        ),
+        ttl=GCP_CONFIGURATION_TTL
+    )
+
+
+def get_cached_azure_kubernetes_config(
+        tenant_id: str,
+        client_id: str,
+        client_secret: str,
+        resource_group: str,
+        cluster_name: str,
+        subscription_id: str
+):
+    from configuration.azure.azure_config import get_azure_kubernetes_config
+
+    return configuration_cache.get(
+        # A rotated secret must not be served the Configuration built with the previous one.
+        key=(
+            'AZURE', tenant_id, client_id, subscription_id, resource_group, cluster_name,
+            hashlib.sha256(client_secret.encode()).hexdigest()
+        ),
+        builder=lambda: get_azure_kubernetes_config(
+            tenant_id=tenant_id,
+            client_id=client_id,
+            client_secret=client_secret,
+            resource_group=resource_group,
+            cluster_name=cluster_name,
+            subscription_id=subscription_id,
+            k8config=True
+        ),
+        ttl=AZURE_CONFIGURATION_TTL
+    )
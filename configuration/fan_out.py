@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+from configuration.aws.clouds import get_configuration
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+DEFAULT_MAX_WORKERS = 32
+DEFAULT_CLOUD_CONCURRENCY = {
+    'AWS': 10,
+    'GCP': 10,
+    'AZURE': 5,
+}
+
+
+@dataclass
+class ClusterDescriptor:
+    """
+    cloud_type is AWS, GCP or AZURE, params are the keyword arguments of that cloud's configuration builder.
+    """
+    cloud_type: str
+    params: dict = field(default_factory=dict)
+    name: str = None
+
+
+@dataclass
+class FanOutResult:
+    cluster: ClusterDescriptor
+    result: object = None
+    error: Exception = None
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class FanOutExecutor:
+    """
+    Run one operation across many clusters at once.
+    Configurations are resolved in parallel with at most cloud_concurrency[cloud] builds per cloud in flight,
+    then operation(configuration, cluster) runs on the same worker pool. Results and errors are yielded
+    per cluster as they complete.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, cloud_concurrency: dict = None):
+        self.__max_workers = max_workers
+        limits = dict(DEFAULT_CLOUD_CONCURRENCY)
+        limits.update(cloud_concurrency or {})
+        self.__semaphores = {cloud: threading.BoundedSemaphore(limit) for cloud, limit in limits.items()}
+
+    def __run_one(self, cluster: ClusterDescriptor, operation: Callable) -> FanOutResult:
+        start = time.monotonic()
+        try:
+            with self.__semaphores[cluster.cloud_type]:
+                configuration = get_configuration(cluster.cloud_type, **cluster.params)
+            result = operation(configuration, cluster)
+        except Exception as e:
+            logger.error(f'FanOutExecutor: Failed on {cluster.cloud_type} cluster {cluster.name}: {e}')
+            return FanOutResult(cluster=cluster, error=e, duration=time.monotonic() - start)
+        return FanOutResult(cluster=cluster, result=result, duration=time.monotonic() - start)
+
+    def run(self, clusters: Iterable[ClusterDescriptor], operation: Callable) -> Iterator[FanOutResult]:
+        clusters = list(clusters)
+        for cluster in clusters:
+            if cluster.cloud_type not in self.__semaphores:
+                raise Exception(f'Unsupported cloud type {cluster.cloud_type}.')
+        executor = ThreadPoolExecutor(max_workers=self.__max_workers, thread_name_prefix='fan-out')
+        try:
+            futures = [executor.submit(self.__run_one, cluster, operation) for cluster in clusters]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Stop scheduling remaining clusters if the caller stops consuming results.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run_all(self, clusters: Iterable[ClusterDescriptor], operation: Callable) -> list:
+        return list(self.run(clusters, operation))
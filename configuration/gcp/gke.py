@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import google.auth
+import google.auth.transport.requests
+from configuration.ca_store import ca_store
+from configuration.cache import ConfigurationCache
+from configuration.token_refresh import BearerTokenRefresher
+from google.cloud import container_v1
+from kubernetes import client
+from kubernetes.metrics import config_build_step, metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+CLOUD_PLATFORM_SCOPE = 'https://www.googleapis.com/auth/cloud-platform'
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # Refresh once the access token is this close to expiry
+CLUSTER_METADATA_TTL = 10 * 60  # Seconds
+DEFAULT_TOKEN_LIFETIME = 60 * 60  # Seconds, assumed for credentials reporting no expiry
+
+
+class GoogleCredentialProvider:
+    """
+    One Application Default Credentials object and one ClusterManagerClient (gRPC channel) for the process.
+    The access token is refreshed only when it is missing or close to expiry.
+    """
+
+    def __init__(self, refresh_margin: timedelta = TOKEN_REFRESH_MARGIN):
+        self.__refresh_margin = refresh_margin
+        self.__lock = threading.Lock()
+        self.__credentials = None
+        self.__request = None
+        self.__cluster_manager_client = None
+
+    def get_credentials(self):
+        with self.__lock:
+            if self.__credentials is None:
+                self.__credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+                # Wraps a requests.Session, so token refreshes reuse one connection pool.
+                self.__request = google.auth.transport.requests.Request()
+            return self.__credentials
+
+    def get_token(self, force_refresh=False) -> str:
+        return self.get_token_with_expiry(force_refresh=force_refresh)[0]
+
+    def get_token_with_expiry(self, force_refresh=False) -> tuple:
+        """
+        (token, expires_at) with expires_at in epoch seconds. force_refresh ignores the current token.
+        """
+        credentials = self.get_credentials()
+        with self.__lock:
+            expiry = credentials.expiry
+            if (
+                    force_refresh or credentials.token is None or expiry is None
+                    or expiry - datetime.utcnow() < self.__refresh_margin
+            ):
+                credentials.refresh(self.__request)
+            # google.auth keeps expiry as a naive UTC datetime.
+            expiry = credentials.expiry
+            if expiry is None:
+                return credentials.token, time.time() + DEFAULT_TOKEN_LIFETIME
+            return credentials.token, expiry.replace(tzinfo=timezone.utc).timestamp()
+
+    def get_cluster_manager_client(self):
+        credentials = self.get_credentials()
+        with self.__lock:
+            if self.__cluster_manager_client is None:
+                self.__cluster_manager_client = container_v1.ClusterManagerClient(credentials=credentials)
+            return self.__cluster_manager_client
+
+    def reset(self):
+        """
+        Forget the credentials and client, the next call discovers them again.
+        """
+        with self.__lock:
+            self.__credentials = None
+            self.__request = None
+            self.__cluster_manager_client = None
+
+
+google_credentials = GoogleCredentialProvider()
+# Endpoint and CA per (project_id, location, cluster_id).
+cluster_metadata_cache = ConfigurationCache()
+
+
+def get_location(zone=None, region=None) -> str:
+    location = zone or region
+    if not location:
+        raise Exception('Please specify zone or region.')
+    return location
+
+
+def get_cluster_metadata(project_id: str, location: str, cluster_id: str) -> dict:
+    """
+    Dict with keys: endpoint, certificate_authority_data, cached for CLUSTER_METADATA_TTL.
+    """
+    def get_cluster():
+        logger.info(f'Attempting to get cluster {cluster_id} in project {project_id} in region/zone {location}.')
+        with config_build_step('GCP', cluster_id, 'get_cluster'):
+            response = google_credentials.get_cluster_manager_client().get_cluster(
+                name=f"/{project_id}/locations/{location}/clusters/{cluster_id}"
+            )
+        return {
+            'endpoint': response.endpoint,
+            'certificate_authority_data': response.master_auth.cluster_ca_certificate,
+        }
+
+    return cluster_metadata_cache.get(key=(project_id, location, cluster_id), builder=get_cluster, ttl=CLUSTER_METADATA_TTL)
+
+
+def get_kube_configuration(project_id: str, cluster_id: str, zone=None, region=None, return_configuration_dict=False):
+    location = get_location(zone=zone, region=region)
+    logger.info('Attempting to init k8s client from cluster response.')
+    metadata = get_cluster_metadata(project_id, location, cluster_id)
+    certificate_authority_data = metadata['certificate_authority_data']
+    name = f'gke_{project_id}_{location}_{cluster_id}'
+    host = f'https://{metadata["endpoint"]}'
+    with config_build_step('GCP', cluster_id, 'refresh_credentials'):
+        token, expires_at = google_credentials.get_token_with_expiry()
+    metrics.register_cluster(host, 'GCP', cluster_id)
+    configuration = client.Configuration()
+    configuration.host = host
+    config = {
+        'certificate_authority_data': certificate_authority_data,
+        'host': host,
+        'name': name,
+        'token': token,
+    }
+    if return_configuration_dict:
+        return config
+    ca_store.attach(configuration, certificate_authority_data)
+    BearerTokenRefresher(
+        google_credentials.get_token_with_expiry,
+        identity=('GCP', project_id, location, cluster_id)
+    ).attach(configuration, token, expires_at)
+    logger.info(f'Kube configuration completed for project id {project_id}.')
+    return configuration
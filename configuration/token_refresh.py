@@ -0,0 +1,69 @@
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+REFRESH_BEFORE_EXPIRY = 60  # Seconds
+AUTHORIZATION = 'authorization'
+
+
+class BearerTokenRefresher:
+    """
+    refresh_api_key_hook of a Configuration. The client calls it before every request, it swaps in a new bearer
+    token once the current one is close to expiry, so a long-lived Configuration, its ApiClient and connection pool
+    never need rebuilding. fetch_token(force_refresh) returns (token, expires_at) with expires_at in epoch seconds,
+    force_refresh asks it to bypass its own caches after the API server rejected a token.
+    Copies of the Configuration share the refresher and receive its current token. identity names the cluster and
+    principal the tokens are for, so rebuilds of the same Configuration can share one pooled ApiClient.
+    """
+
+    def __init__(self, fetch_token, identity: tuple = None, refresh_before_expiry: int = REFRESH_BEFORE_EXPIRY):
+        self.__fetch_token = fetch_token
+        self.identity = identity
+        self.__refresh_before_expiry = refresh_before_expiry
+        self.__lock = threading.Lock()
+        self.__token = None
+        self.__expires_at = 0
+        self.refreshes = 0
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Configuration.__deepcopy__ copies its hook too, copies must keep refreshing through this refresher.
+        return self
+
+    def attach(self, configuration, token: str, expires_at: float):
+        """
+        Install the refresher on configuration, starting from the token the builder already fetched.
+        """
+        with self.__lock:
+            self.__token = token
+            self.__expires_at = expires_at
+        configuration.api_key_prefix[AUTHORIZATION] = 'Bearer'
+        configuration.api_key[AUTHORIZATION] = token
+        configuration.refresh_api_key_hook = self
+        return configuration
+
+    def __call__(self, configuration):
+        if self.__expires_at - time.time() <= self.__refresh_before_expiry:
+            with self.__lock:
+                if self.__expires_at - time.time() <= self.__refresh_before_expiry:
+                    self.__refresh(force_refresh=False)
+        configuration.api_key[AUTHORIZATION] = self.__token
+
+    def force_refresh(self, configuration, rejected_token: str = None):
+        """
+        Fetch a new token after a 401. Concurrent callers rejected with the same token share one fetch.
+        """
+        with self.__lock:
+            if rejected_token is None or rejected_token == self.__token:
+                self.__refresh(force_refresh=True)
+        configuration.api_key[AUTHORIZATION] = self.__token
+
+    def __refresh(self, force_refresh: bool):
+        self.__token, self.__expires_at = self.__fetch_token(force_refresh)
+        self.refreshes += 1
+        logger.info(f'BearerTokenRefresher: Refreshed bearer token, forced {force_refresh}.')
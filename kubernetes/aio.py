@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kubernetes.api_client_registry import api_client_registry
+from kubernetes.config_map import ConfigMapManager
+from kubernetes.cron_job import CronJobManager
+from kubernetes.daemon_set import DaemonSetManager
+from kubernetes.deployments import DeploymentManager
+from kubernetes.ingress import IngressManager
+from kubernetes.job import JobManager
+from kubernetes.namespace import NamespaceManager
+from kubernetes.pod import PodManager
+from kubernetes.secret import SecretManager
+from kubernetes.service import ServiceManager
+from kubernetes.service_account import ServiceAccountManager
+from kubernetes.stateful_set import StatefulManager
+from kubernetes.throttle import request_deadline
+
+DEFAULT_MAX_CONCURRENCY = 32
+_DONE = object()
+
+_lock = threading.Lock()
+_executor = None
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+
+
+def set_max_concurrency(max_concurrency: int):
+    """
+    Set how many API calls async managers run at once. Must be called before the first async call.
+    """
+    global _max_concurrency
+    with _lock:
+        if _executor is not None:
+            raise Exception('Async managers are already running, set max concurrency before the first call.')
+        _max_concurrency = max_concurrency
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_max_concurrency, thread_name_prefix='kube-aio')
+        return _executor
+
+
+def _make_async(name):
+    async def method(self, *args, _timeout=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(getattr(self._manager, name), *args, **kwargs)
+
+        def bounded_call():
+            # Ends the HTTP requests themselves, so a timed out call frees its executor thread.
+            with request_deadline(_timeout):
+                return call()
+
+        return await asyncio.wait_for(loop.run_in_executor(get_executor(), bounded_call), _timeout)
+
+    method.__name__ = name
+    return method
+
+
+def _make_async_iter(name):
+    async def method(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(getattr(self._manager, name), *args, **kwargs)
+        iterator = await loop.run_in_executor(get_executor(), call)
+        while True:
+            item = await loop.run_in_executor(get_executor(), next, iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    method.__name__ = name
+    return method
+
+
+def _make_sync(name):
+    def method(self, *args, **kwargs):
+        return getattr(self._manager, name)(*args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+class AsyncManager:
+    """
+    Awaitable counterpart of a sync manager.
+    Every public method of manager_class is exposed as a coroutine which runs on an executor bounded by
+    the max concurrency and shared by all async managers. The ApiClient comes from api_client_registry
+    with a connection pool of the same size, so concurrent calls reuse keep-alive connections.
+    Each coroutine takes a keyword-only _timeout in seconds. On timeout or cancellation the awaiting task is released
+    right away, but cancellation does not stop in-flight I/O: the blocking call keeps its executor thread until its
+    HTTP requests end. _timeout is therefore also passed down as the _request_timeout of every request the call
+    makes, retries included (see throttle.request_deadline), so the thread is freed shortly after the timeout.
+    Cancelling without a _timeout leaves the call running to completion.
+    iter_* methods become async generators fetching page by page on the same executor.
+    Methods in sync_methods do no I/O and stay synchronous.
+    """
+    manager_class = None
+    sync_methods = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, attr in inspect.getmembers(cls.manager_class):
+            if name.startswith('_') or name in cls.__dict__:
+                continue
+            if not callable(attr):
+                setattr(cls, name, attr)
+            elif name in cls.sync_methods:
+                setattr(cls, name, _make_sync(name))
+            elif name.startswith('iter_'):
+                setattr(cls, name, _make_async_iter(name))
+            else:
+                setattr(cls, name, _make_async(name))
+
+    def __init__(self, namespace, configuration=None, api_client=None, **kwargs):
+        if api_client is None:
+            api_client = api_client_registry.get(configuration, connection_pool_maxsize=_max_concurrency)
+        self._manager = self.manager_class(namespace, api_client=api_client, **kwargs)
+
+
+class AsyncConfigMapManager(AsyncManager):
+    manager_class = ConfigMapManager
+    sync_methods = ('get_properties', 'render_properties', 'properties_hash')
+
+
+class AsyncCronJobManager(AsyncManager):
+    manager_class = CronJobManager
+
+
+class AsyncDaemonSetManager(AsyncManager):
+    manager_class = DaemonSetManager
+
+
+class AsyncDeploymentManager(AsyncManager):
+    manager_class = DeploymentManager
+
+
+class AsyncIngressManager(AsyncManager):
+    manager_class = IngressManager
+
+
+class AsyncJobManager(AsyncManager):
+    manager_class = JobManager
+
+
+class AsyncNamespaceManager(AsyncManager):
+    manager_class = NamespaceManager
+
+
+class AsyncPodManager(AsyncManager):
+    manager_class = PodManager
+
+
+class AsyncSecretManager(AsyncManager):
+    manager_class = SecretManager
+
+
+class AsyncServiceManager(AsyncManager):
+    manager_class = ServiceManager
+    sync_methods = (
+        'get_yaml',
+        'get_body',
+        'get_key_value_params_envs',
+        'get_key_value_params_labels',
+        'get_key_value_envs',
+        'get_key_value_labels'
+    )
+
+
+class AsyncServiceAccountManager(AsyncManager):
+    manager_class = ServiceAccountManager
+
+
+class AsyncStatefulManager(AsyncManager):
+    manager_class = StatefulManager
@@ -0,0 +1,112 @@
+import atexit
+import copy
+import hashlib
+import threading
+
+from kubernetes import client
+from kubernetes.throttle import RateLimitedApiClient
+
+DEFAULT_CONNECTION_POOL_MAXSIZE = 10
+
+
+def get_api_client(configuration=None, api_client=None):
+    """
+    Returns api_client when given, otherwise a new rate limited ApiClient for configuration.
+    """
+    if api_client is not None:
+        return api_client
+    return RateLimitedApiClient(configuration=configuration)
+
+
+def _slot(configuration) -> tuple:
+    """
+    Cluster and principal a Configuration authenticates as. Refreshing Configurations name their token source
+    in refresh_api_key_hook.identity, so every rebuild of the same cluster Configuration lands in the same slot.
+    A static token is its own principal, kept in the slot as a digest only.
+    """
+    refresher = configuration.refresh_api_key_hook
+    if refresher is None:
+        token = configuration.api_key.get('authorization')
+        principal = token and hashlib.sha256(token.encode()).hexdigest()
+    else:
+        principal = getattr(refresher, 'identity', None) or refresher
+    return configuration.host, principal, configuration.username, configuration.cert_file, configuration.key_file
+
+
+def _settings(configuration) -> tuple:
+    """
+    Connection settings of a Configuration, a client built from other settings is superseded.
+    """
+    return configuration.ssl_ca_cert, configuration.verify_ssl, configuration.proxy
+
+
+class ApiClientRegistry:
+    """
+    Hands out one pooled ApiClient per cluster and principal, so managers for different resource kinds
+    reuse the same keep-alive connections to the API server instead of opening one pool each.
+    A Configuration rebuilt with the same settings (e.g. after a cache TTL) reuses the registered client. One with
+    new CA or TLS settings supersedes it, and the superseded client's connections are closed. Each static token
+    gets its own client, close releases the client of a token that is no longer used.
+    The client is built on a copy of the Configuration carrying connection_pool_maxsize, the caller's object
+    is left untouched.
+    """
+
+    def __init__(self, connection_pool_maxsize: int = DEFAULT_CONNECTION_POOL_MAXSIZE):
+        self.__connection_pool_maxsize = connection_pool_maxsize
+        self.__lock = threading.Lock()
+        self.__clients = dict()
+
+    def get(self, configuration=None, connection_pool_maxsize: int = None):
+        """
+        Returns the shared ApiClient for configuration, creating it on first use.
+        """
+        if configuration is None:
+            configuration = client.Configuration.get_default_copy()
+        slot, settings = _slot(configuration), _settings(configuration)
+        with self.__lock:
+            superseded = self.__clients.get(slot)
+            if superseded is not None and superseded[1] == settings:
+                return superseded[2]
+            pooled_configuration = copy.copy(configuration)
+            pooled_configuration.connection_pool_maxsize = (
+                connection_pool_maxsize or self.__connection_pool_maxsize
+            )
+            api_client = get_api_client(configuration=pooled_configuration)
+            # The caller's Configuration is kept alive with its client, CA files attached to it stay in place.
+            self.__clients[slot] = (configuration, settings, api_client)
+        if superseded is not None:
+            self.__close_api_client(superseded[2])
+        return api_client
+
+    def close(self, configuration=None):
+        """
+        Close the pooled connections of configuration and drop its ApiClient from the registry.
+        """
+        if configuration is None:
+            configuration = client.Configuration.get_default_copy()
+        slot = _slot(configuration)
+        with self.__lock:
+            entry = self.__clients.get(slot)
+            if entry is None or entry[1] != _settings(configuration):
+                return
+            del self.__clients[slot]
+        self.__close_api_client(entry[2])
+
+    def shutdown(self):
+        """
+        Close every ApiClient handed out by the registry.
+        """
+        with self.__lock:
+            entries = list(self.__clients.values())
+            self.__clients.clear()
+        for _, _, api_client in entries:
+            self.__close_api_client(api_client)
+
+    @staticmethod
+    def __close_api_client(api_client):
+        api_client.close()
+        api_client.rest_client.pool_manager.clear()
+
+
+api_client_registry = ApiClientRegistry()
+atexit.register(api_client_registry.shutdown)
@@ -0,0 +1,134 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.manifest import load_all_manifests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+DEFAULT_MAX_WORKERS = 10
+HTTP_STATUS_CONFLICT = 409
+
+ACTION_CREATED = 'created'
+ACTION_PATCHED = 'patched'
+ACTION_SKIPPED = 'skipped'
+ACTION_FAILED = 'failed'
+
+# Objects are applied tier by tier, every tier only once the previous one is done.
+TIERS = (
+    ('Namespace',),
+    ('ServiceAccount', 'Secret', 'ConfigMap'),
+    ('Deployment', 'DaemonSet', 'StatefulSet', 'Job', 'CronJob', 'Pod'),
+    ('Service', 'Ingress'),
+)
+
+
+@dataclass
+class ApplyResult:
+    kind: str
+    name: str
+    namespace: str = None
+    action: str = None
+    error: Exception = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.action != ACTION_SKIPPED
+
+
+class BulkApplier:
+    """
+    Apply a multi-document YAML stream or a list of dicts in dependency order:
+    namespaces, then service accounts, secrets and config maps, then workloads, then services and ingresses.
+    Objects within a tier are applied concurrently. Each object is created, or patched if it already exists.
+    """
+
+    def __init__(self, namespace, configuration=None, api_client=None, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.__namespace = namespace
+        self.__max_workers = max_workers
+        api_client = get_api_client(configuration=configuration, api_client=api_client)
+        core_client = client.CoreV1Api(api_client)
+        apps_client = client.AppsV1Api(api_client)
+        batch_client = client.BatchV1Api(api_client)
+        networking_client = client.NetworkingV1Api(api_client)
+        # kind: (create, patch, namespaced)
+        self.__operations = {
+            'Namespace': (core_client.create_namespace, core_client.patch_namespace, False),
+            'ServiceAccount': (
+                core_client.create_namespaced_service_account, core_client.patch_namespaced_service_account, True
+            ),
+            'Secret': (core_client.create_namespaced_secret, core_client.patch_namespaced_secret, True),
+            'ConfigMap': (core_client.create_namespaced_config_map, core_client.patch_namespaced_config_map, True),
+            'Deployment': (apps_client.create_namespaced_deployment, apps_client.patch_namespaced_deployment, True),
+            'DaemonSet': (apps_client.create_namespaced_daemon_set, apps_client.patch_namespaced_daemon_set, True),
+            'StatefulSet': (
+                apps_client.create_namespaced_stateful_set, apps_client.patch_namespaced_stateful_set, True
+            ),
+            'Job': (batch_client.create_namespaced_job, batch_client.patch_namespaced_job, True),
+            'CronJob': (batch_client.create_namespaced_cron_job, batch_client.patch_namespaced_cron_job, True),
+            'Pod': (core_client.create_namespaced_pod, core_client.patch_namespaced_pod, True),
+            'Service': (core_client.create_namespaced_service, core_client.patch_namespaced_service, True),
+            'Ingress': (
+                networking_client.create_namespaced_ingress, networking_client.patch_namespaced_ingress, True
+            ),
+        }
+
+    def apply(self, manifests, stop_on_error: bool = True) -> List[ApplyResult]:
+        """
+        Returns one ApplyResult per object, in tier order.
+        With stop_on_error, objects of later tiers are skipped once a tier has a failure.
+        """
+        if isinstance(manifests, str):
+            manifests = load_all_manifests(manifests)
+        objects = [manifest for manifest in manifests if manifest]
+        for obj in objects:
+            if obj.get('kind') not in self.__operations:
+                raise Exception(
+                    'Unsupported kind {kind}. Supported kind {supported_kind}.'.format(
+                        kind=obj.get('kind'),
+                        supported_kind=' or '.join(self.__operations)
+                    )
+                )
+        results = list()
+        failed = False
+        with ThreadPoolExecutor(max_workers=self.__max_workers, thread_name_prefix='bulk-apply') as executor:
+            for tier in TIERS:
+                tier_objects = [obj for obj in objects if obj['kind'] in tier]
+                if failed and stop_on_error:
+                    results.extend(self.__result(obj, action=ACTION_SKIPPED) for obj in tier_objects)
+                    continue
+                tier_results = list(executor.map(self.__apply_one, tier_objects))
+                failed = failed or any(result.error is not None for result in tier_results)
+                results.extend(tier_results)
+        return results
+
+    def __result(self, obj, **kwargs) -> ApplyResult:
+        namespace = None
+        if self.__operations[obj['kind']][2]:
+            namespace = obj['metadata'].get('namespace') or self.__namespace
+        return ApplyResult(kind=obj['kind'], name=obj['metadata']['name'], namespace=namespace, **kwargs)
+
+    def __apply_one(self, obj) -> ApplyResult:
+        create, patch, namespaced = self.__operations[obj['kind']]
+        result = self.__result(obj)
+        kwargs = dict(body=obj)
+        if namespaced:
+            kwargs['namespace'] = result.namespace
+        try:
+            try:
+                create(**kwargs)
+                result.action = ACTION_CREATED
+            except client.ApiException as e:
+                if e.status != HTTP_STATUS_CONFLICT:
+                    raise
+                patch(name=result.name, **kwargs)
+                result.action = ACTION_PATCHED
+        except Exception as e:
+            logger.error(f'BulkApplier: Failed to apply {result.kind} {result.name}: {e}')
+            result.action = ACTION_FAILED
+            result.error = e
+        return result
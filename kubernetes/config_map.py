@@ -1,122 +1,339 @@
 from kubernetes import client
-import json
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.pagination import iterate_pages, DEFAULT_PAGE_SIZE
+from kubernetes.informer import Informer
+from kubernetes.properties import (
+    dumps,
+    loads,
+    decode_value,
+    compress,
+    decompress,
+    split,
+    PROPERTIES_KEY,
+    COMPRESSED_PROPERTIES_KEY,
+    PAYLOAD_THRESHOLD_BYTES
+)
+import hashlib
+import threading
+
+PROPERTIES_HASH_ANNOTATION = 'cloud-connection/properties-hash'
+PROPERTIES_SHARDS_ANNOTATION = 'cloud-connection/properties-shards'
+PROPERTIES_SHARD_SET_ANNOTATION = 'cloud-connection/properties-shard-set'
+SHARD_OWNER_LABEL = 'cloud-connection/properties-owner'
+SHARD_INDEX_LABEL = 'cloud-connection/properties-shard'
+SHARD_KEY = 'config.properties.gz.part'
+HTTP_STATUS_NOT_FOUND = 404
+HTTP_STATUS_CONFLICT = 409
+NO_SHARDS = (None, 0)
+
+# Last properties and shard set known to be on the server, per (host, namespace, name), shared by all managers of
+# the process.
+_applied_properties_lock = threading.Lock()
+_applied_properties = dict()
 
 
 class ConfigMapManager:
-    def __init__(self, namespace: str, configuration=None):
+    """
+    Properties are stored as text under config.properties. Once they grow past PAYLOAD_THRESHOLD_BYTES they are
+    stored gzip compressed in binaryData, and if that is still too large, sharded across <name>-shard-<set>-<i>
+    config maps, <set> naming their content. read_properties reassembles them transparently.
+    A new shard set is written before the main config map points at it, the previous one is deleted after.
+    """
+
+    def __init__(self, namespace: str, configuration=None, api_client=None, config_map_informer: Informer = None):
+        """
+        With a synced config_map_informer, patch_if_changed compares against the watched config maps.
+        """
         self.__namespace = namespace
-        self.__api_client = client.ApiClient(configuration=configuration)
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__core_api = client.CoreV1Api(self.__api_client)
+        self.__config_map_informer = config_map_informer
 
-    def get_properties(self, properties: dict) -> str:
-        data = []
-        for k, v in properties.items():
-            if type(v) == bool:
-                val = json.dumps(v)
+    def start_informer(self, timeout: float = None) -> Informer:
+        self.__config_map_informer = Informer(
+            self.__core_api.list_namespaced_config_map,
+            namespace=self.__namespace
+        ).start()
+        self.__config_map_informer.wait_for_sync(timeout)
+        return self.__config_map_informer
+
+    def properties_hash(self, properties: dict, exclude_keys: list = None) -> str:
+        exclude_keys = exclude_keys or ()
+        filtered = {k: properties[k] for k in sorted(properties) if k not in exclude_keys}
+        return hashlib.sha256(self.get_properties(filtered).encode()).hexdigest()
+
+    def __applied_key(self, name):
+        return self.__api_client.configuration.host, self.__namespace, name
+
+    def __get_applied(self, name):
+        """
+        Returns (properties, shard set) or None.
+        """
+        with _applied_properties_lock:
+            return _applied_properties.get(self.__applied_key(name))
+
+    def __set_applied(self, name, properties, shard_set):
+        with _applied_properties_lock:
+            _applied_properties[self.__applied_key(name)] = (dict(properties), shard_set)
+
+    def __body(self, name, properties, labels, create):
+        """
+        Returns the main config map body, its shard set and the payloads of its shards.
+        Patch bodies null out the representations not in use, so switching between them leaves nothing stale.
+        """
+        content = self.get_properties(properties)
+        data = {PROPERTIES_KEY: None}
+        binary_data = {COMPRESSED_PROPERTIES_KEY: None}
+        annotations = {
+            PROPERTIES_HASH_ANNOTATION: self.properties_hash(properties),
+            PROPERTIES_SHARDS_ANNOTATION: None,
+            PROPERTIES_SHARD_SET_ANNOTATION: None
+        }
+        shard_set = NO_SHARDS
+        shards = []
+        if len(content.encode()) <= PAYLOAD_THRESHOLD_BYTES:
+            data[PROPERTIES_KEY] = content
+        else:
+            compressed = compress(content)
+            if len(compressed) <= PAYLOAD_THRESHOLD_BYTES:
+                binary_data[COMPRESSED_PROPERTIES_KEY] = compressed
+            else:
+                shards = split(compressed)
+                shard_set = hashlib.sha256(compressed.encode()).hexdigest()[:12], len(shards)
+                annotations[PROPERTIES_SHARD_SET_ANNOTATION], annotations[PROPERTIES_SHARDS_ANNOTATION] = (
+                    shard_set[0], str(shard_set[1])
+                )
+        if create:
+            data = {k: v for k, v in data.items() if v is not None} or None
+            binary_data = {k: v for k, v in binary_data.items() if v is not None} or None
+            annotations = {k: v for k, v in annotations.items() if v is not None}
+        body = client.V1ConfigMap(
+            api_version="v1",
+            kind="ConfigMap",
+            metadata=client.V1ObjectMeta(
+                name=name,
+                namespace=self.__namespace,
+                labels=labels,
+                annotations=annotations
+            ),
+            data=data,
+            binary_data=binary_data,
+        )
+        return body, shard_set, shards
+
+    @staticmethod
+    def __shard_owner(name):
+        # Label values are limited to 63 characters, config map names are not.
+        return hashlib.sha256(name.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def __shard_set(config_map) -> tuple:
+        """
+        (set, count) of the shards config_map points at. Shards written before sets existed have no set.
+        """
+        annotations = config_map.metadata.annotations or {}
+        return annotations.get(PROPERTIES_SHARD_SET_ANNOTATION), int(annotations.get(PROPERTIES_SHARDS_ANNOTATION, 0))
+
+    @staticmethod
+    def __shard_names(name, shard_set) -> list:
+        set_id, count = shard_set
+        if set_id is None:
+            return [f'{name}-shard-{index}' for index in range(count)]
+        return [f'{name}-shard-{set_id}-{index}' for index in range(count)]
+
+    def __write_shards(self, name, shard_set, shards) -> list:
+        """
+        Create the shards of a set and return the names created. Shard names follow their content, so an existing
+        shard already holds the same payload and is left as it is.
+        """
+        created = []
+        for index, (shard_name, payload) in enumerate(zip(self.__shard_names(name, shard_set), shards)):
+            body = client.V1ConfigMap(
+                api_version="v1",
+                kind="ConfigMap",
+                metadata=client.V1ObjectMeta(
+                    name=shard_name,
+                    namespace=self.__namespace,
+                    labels={SHARD_OWNER_LABEL: self.__shard_owner(name), SHARD_INDEX_LABEL: str(index)}
+                ),
+                binary_data={SHARD_KEY: payload},
+            )
+            try:
+                self.__core_api.create_namespaced_config_map(namespace=self.__namespace, body=body)
+            except client.ApiException as e:
+                if e.status != HTTP_STATUS_CONFLICT:
+                    self.__delete_shards(created)
+                    raise
             else:
-                val = v
-            data.append('{key}={value}'.format(key=k, value=val))
-        return '\n'.join(data)
+                created.append(shard_name)
+        return created
+
+    def __delete_shards(self, shard_names):
+        for shard_name in shard_names:
+            try:
+                self.__core_api.delete_namespaced_config_map(name=shard_name, namespace=self.__namespace)
+            except client.ApiException as e:
+                if e.status != HTTP_STATUS_NOT_FOUND:
+                    raise
+
+    def __previous_shard_set(self, name) -> tuple:
+        """
+        Shard set the config map points at before a write: as last applied by this process, else from the informer
+        when synced, else read from the server.
+        """
+        applied = self.__get_applied(name)
+        if applied is not None:
+            return applied[1]
+        informer = self.__config_map_informer
+        if informer is not None and informer.has_synced:
+            config_map = informer.get(name)
+            return NO_SHARDS if config_map is None else self.__shard_set(config_map)
+        return self.__shard_set(self.read_namespaced_config_map(name=name))
+
+    def __decode(self, config_map, read) -> dict:
+        data = config_map.data or {}
+        binary_data = config_map.binary_data or {}
+        if PROPERTIES_KEY in data:
+            return self.render_properties(data[PROPERTIES_KEY])
+        if COMPRESSED_PROPERTIES_KEY in binary_data:
+            return self.render_properties(decompress(binary_data[COMPRESSED_PROPERTIES_KEY]))
+        shard_names = self.__shard_names(config_map.metadata.name, self.__shard_set(config_map))
+        if not shard_names:
+            return dict()
+        payloads = []
+        for shard_name in shard_names:
+            shard = read(shard_name)
+            if shard is None:
+                raise client.ApiException(status=404, reason='Not Found')
+            payloads.append(shard.binary_data[SHARD_KEY])
+        return self.render_properties(decompress(''.join(payloads)))
+
+    def get_properties(self, properties: dict) -> str:
+        return dumps(properties)
 
     def _handle_val(self, data):
-        if data == 'True' or data == 'False':
-            return eval(data)
-        try:
-            return int(data)
-        except:
-            pass
-        if data == 'true':
-            return True
-        if data == 'false':
-            return False
-        return data
+        return decode_value(data)
 
     def render_properties(self, properties: str) -> dict:
-        prop = dict()
-        for item in properties.split('\n'):
-            if item.strip():
-                k, *v = item.split('=')
-                v = '='.join(v)
-                prop.update({
-                    k: self._handle_val(v)
-                })
-        return prop
+        return loads(properties)
 
     def create(self, name, properties, labels=None):
         if labels is None:
             labels = {}
         # default_labels = {'app': 'e6data', 'component': name.split('-')[-1]}
         # labels.update(default_labels)
-        secret = client.V1ConfigMap(
-            api_version="v1",
-            kind="ConfigMap",
-            metadata=client.V1ObjectMeta(
-                name=name,
-                namespace=self.__namespace,
-                labels=labels
-            ),
-            data={'config.properties': self.get_properties(properties)},
-        )
-        return self.__core_api.create_namespaced_config_map(namespace=self.__namespace, body=secret)
+        secret, shard_set, shards = self.__body(name, properties, labels, create=True)
+        created = self.__write_shards(name, shard_set, shards)
+        try:
+            response = self.__core_api.create_namespaced_config_map(namespace=self.__namespace, body=secret)
+        except client.ApiException:
+            # Only the shards created here, an existing config map may point at shards of the same content.
+            self.__delete_shards(created)
+            raise
+        self.__set_applied(name, properties, shard_set)
+        return response
 
     def list_namespaced_config_map(self):
         return self.__core_api.list_namespaced_config_map(namespace=self.__namespace)
 
+    def iter_namespaced_config_map(
+            self,
+            label_selector: str = None,
+            field_selector: str = None,
+            page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        return iterate_pages(
+            self.__core_api.list_namespaced_config_map,
+            page_size=page_size,
+            namespace=self.__namespace,
+            label_selector=label_selector,
+            field_selector=field_selector
+        )
+
     def read_namespaced_config_map(self, name: str):
         return self.__core_api.read_namespaced_config_map(
             name=name,
             namespace=self.__namespace
         )
 
+    def read_properties(self, name: str) -> dict:
+        """
+        Properties of the config map, whether stored as text, compressed or sharded.
+        """
+        return self.__decode(self.read_namespaced_config_map(name=name), self.read_namespaced_config_map)
+
     def patch(self, name, properties, labels=None):
         if labels is None:
             labels = {}
         # default_labels = {'app': 'e6data', 'component': name.split('-')[-1]}
         # labels.update(default_labels)
-        secret = client.V1ConfigMap(
-            api_version="v1",
-            kind="ConfigMap",
-            metadata=client.V1ObjectMeta(
-                name=name,
-                namespace=self.__namespace,
-                labels=labels
-            ),
-            data={'config.properties': self.get_properties(properties)},
-        )
-        return self.__core_api.patch_namespaced_config_map(name=name, namespace=self.__namespace, body=secret)
+        return self.__patch(name, properties, labels)
+
+    def __patch(self, name, properties, labels):
+        secret, shard_set, shards = self.__body(name, properties, labels, create=False)
+        previous_shard_set = self.__previous_shard_set(name)
+        created = self.__write_shards(name, shard_set, shards)
+        try:
+            response = self.__core_api.patch_namespaced_config_map(name=name, namespace=self.__namespace, body=secret)
+        except client.ApiException:
+            self.__delete_shards(created)
+            raise
+        self.__set_applied(name, properties, shard_set)
+        if previous_shard_set != shard_set:
+            self.__delete_shards(self.__shard_names(name, previous_shard_set))
+        return response
 
     def compare_properties(self, name: str, properties: dict, exclude_keys: list = None) -> bool:
         """
         Compare existing properties with new.
         To make sure to patch only if there is any change.
         """
-        if not exclude_keys:
-            exclude_keys = list()
-        response = self.read_namespaced_config_map(
-            name=name
-        )
-        existing_properties = self.render_properties(response.data['config.properties'])
-        prop1 = dict()
-        prop2 = dict()
-        for k, v in properties.items():
-            if k not in exclude_keys:
-                prop1.update({k: v})
-        for k, v in existing_properties.items():
-            if k not in exclude_keys:
-                prop2.update({k: v})
-        return prop1 == prop2
+        config_map = self.read_namespaced_config_map(name=name)
+        existing_properties = self.__decode(config_map, self.read_namespaced_config_map)
+        self.__set_applied(name, existing_properties, self.__shard_set(config_map))
+        return self.properties_hash(properties, exclude_keys) == self.properties_hash(existing_properties, exclude_keys)
+
+    def is_changed(self, name: str, properties: dict, exclude_keys: list = None) -> bool:
+        """
+        Decide without a request when possible: from the watched config map if an informer is synced,
+        else from the properties last applied by this process, else by reading the config map.
+        """
+        informer = self.__config_map_informer
+        if informer is not None and informer.has_synced:
+            config_map = informer.get(name)
+            if config_map is None:
+                raise client.ApiException(status=404, reason='Not Found')
+            annotations = config_map.metadata.annotations or {}
+            if not exclude_keys and PROPERTIES_HASH_ANNOTATION in annotations:
+                return annotations[PROPERTIES_HASH_ANNOTATION] != self.properties_hash(properties)
+            existing_properties = self.__decode(config_map, informer.get)
+            return self.properties_hash(properties, exclude_keys) != self.properties_hash(
+                existing_properties, exclude_keys
+            )
+        applied = self.__get_applied(name)
+        if applied is not None:
+            return self.properties_hash(properties, exclude_keys) != self.properties_hash(applied[0], exclude_keys)
+        return not self.compare_properties(name, properties, exclude_keys)
+
+    def patch_if_changed(self, name, properties, labels=None, exclude_keys: list = None):
+        """
+        Patch only when properties, ignoring exclude_keys, differ from the existing ones.
+        Returns None when the patch was skipped.
+        """
+        if not self.is_changed(name, properties, exclude_keys):
+            return None
+        return self.patch(name, properties, labels=labels)
 
     def patch_properties(self, name, properties):
-        secret = client.V1ConfigMap(
-            # api_version="v1",
-            kind="ConfigMap",
-            data={'config.properties': self.get_properties(properties)},
-        )
-        return self.__core_api.patch_namespaced_config_map(name=name, namespace=self.__namespace, body=secret)
+        return self.__patch(name, properties, labels=None)
 
     def delete(self, name: str):
-        return self.__core_api.delete_namespaced_config_map(
+        shard_set = self.__previous_shard_set(name)
+        with _applied_properties_lock:
+            _applied_properties.pop(self.__applied_key(name), None)
+        response = self.__core_api.delete_namespaced_config_map(
             name=name,
             namespace=self.__namespace
         )
-
+        self.__delete_shards(self.__shard_names(name, shard_set))
+        return response
@@ -1,28 +1,44 @@
-import yaml
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.pagination import iterate_pages, DEFAULT_PAGE_SIZE
+from kubernetes.manifest import as_body
 
 
 class CronJobManager:
-    def __init__(self, namespace, configuration=None):
+    def __init__(self, namespace, configuration=None, api_client=None):
         self.__namespace = namespace
-        self.__api_client = client.ApiClient(configuration=configuration)
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__apps_client = client.AppsV1Api(self.__api_client)
         self.__core_client = client.BatchV1Api(self.__api_client)
 
     def create(self, cron_job_yaml: str):
         return self.__core_client.create_namespaced_cron_job(
             namespace=self.__namespace,
-            body=yaml.safe_load(cron_job_yaml)
+            body=as_body(cron_job_yaml)
         )
 
     def list_namespaced_cron_job(self):
         return self.__core_client.list_namespaced_cron_job(namespace=self.__namespace)
 
+    def iter_namespaced_cron_job(
+            self,
+            label_selector: str = None,
+            field_selector: str = None,
+            page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        return iterate_pages(
+            self.__core_client.list_namespaced_cron_job,
+            page_size=page_size,
+            namespace=self.__namespace,
+            label_selector=label_selector,
+            field_selector=field_selector
+        )
+
     def patch(self, name: str, cron_job_yaml: str):
         return self.__core_client.patch_namespaced_cron_job(
             name=name,
             namespace=self.__namespace,
-            body=yaml.safe_load(cron_job_yaml)
+            body=as_body(cron_job_yaml)
         )
 
     def delete(self, name: str):
@@ -1,13 +1,13 @@
-import time
-
-import yaml
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.manifest import as_body
+from kubernetes.rollout import RolloutWaiter, KIND_DAEMON_SET, DEFAULT_TIMEOUT
 
 
 class DaemonSetManager:
-    def __init__(self, namespace, configuration=None):
+    def __init__(self, namespace, configuration=None, api_client=None):
         self.__namespace = namespace
-        self.__api_client = client.ApiClient(configuration=configuration)
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__apps_client = client.AppsV1Api(self.__api_client)
 
     def create(
@@ -15,14 +15,14 @@ class DaemonSetManager:
             body: str
     ):
         return self.__apps_client.create_namespaced_daemon_set(
-            namespace=self.__namespace, body=yaml.safe_load(body)
+            namespace=self.__namespace, body=as_body(body)
         )
 
     def patch(self, name: str, body: str):
         return self.__apps_client.patch_namespaced_daemon_set(
             name=name,
             namespace=self.__namespace,
-            body=yaml.safe_load(body)
+            body=as_body(body)
         )
 
     def delete(self, name: str):
@@ -31,27 +31,15 @@ class DaemonSetManager:
             namespace=self.__namespace
         )
 
-    def watcher(self, name: str):
-        current_retry_max_count = 0
-        MAX_RETRY_COUNT = 36
-        WAITING_TIME_FOR_RETRY = 10  # Seconds
-        while True:
-            ret = self.__apps_client.read_namespaced_daemon_set_status(
-                name=name,
-                namespace=self.__namespace
-            )
-            desired_number_scheduled = ret._status.desired_number_scheduled
-            current_number_scheduled = ret._status.current_number_scheduled
-            number_ready = ret._status.number_ready
-            status = dict(
-                current_number_scheduled=current_number_scheduled,
-                desired_number_scheduled=desired_number_scheduled,
-                number_ready=number_ready
-            )
-            print(status)
-            if desired_number_scheduled == current_number_scheduled == number_ready and number_ready > 0:
-                return True
-            current_retry_max_count += 1
-            time.sleep(WAITING_TIME_FOR_RETRY)
-            if current_retry_max_count >= MAX_RETRY_COUNT:
-                raise Exception('Max retry exceeded.')
+    def watcher(self, name: str, timeout: float = DEFAULT_TIMEOUT, on_progress=None):
+        """
+        Wait until the DaemonSet is scheduled and ready on every node. Unless it uses the OnDelete update strategy,
+        every pod must also run the current template, as observed by the controller.
+        on_progress(kind, name, status) is called on every status change, RolloutTimeout is raised after timeout.
+        """
+        return RolloutWaiter(self.__namespace, api_client=self.__api_client).wait(
+            KIND_DAEMON_SET,
+            [name],
+            timeout=timeout,
+            on_progress=on_progress
+        )
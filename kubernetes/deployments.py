@@ -1,29 +1,142 @@
+import copy
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List
 
-import yaml
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.bulk_apply import ACTION_FAILED, ACTION_PATCHED, ACTION_SKIPPED
+from kubernetes.pagination import iterate_pages, DEFAULT_PAGE_SIZE
+from kubernetes.manifest import as_body
+from kubernetes.informer import Informer
+from kubernetes.rollout import DEFAULT_TIMEOUT, KIND_DEPLOYMENT, RolloutWaiter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+DEFAULT_MAX_WORKERS = 10
+HTTP_STATUS_NOT_FOUND = 404
+ACTION_UNCHANGED = 'unchanged'
+DIGEST_PREFIX = 'sha256:'
+
+
+def replace_image_tag(image: str, tag: str) -> str:
+    """
+    image with its tag or digest replaced by tag, e.g. registry:5000/app:1.0@sha256:... -> registry:5000/app:2.0.
+    A tag of the form sha256:... pins the image by digest instead.
+    """
+    repository = image.split('@', 1)[0]
+    # A colon after the last slash separates the tag, one before it belongs to a registry port.
+    colon = repository.rfind(':')
+    if colon > repository.rfind('/'):
+        repository = repository[:colon]
+    if tag.startswith(DIGEST_PREFIX):
+        return f'{repository}@{tag}'
+    return f'{repository}:{tag}'
+
+
+def _find_container(deployment, container: str):
+    """
+    The container named container, or for backward compatibility the first one whose image contains it.
+    """
+    containers = deployment.spec.template.spec.containers
+    for candidate in containers:
+        if candidate.name == container:
+            return candidate
+    for candidate in containers:
+        if container in candidate.image:
+            return candidate
+    return None
+
+
+@dataclass
+class ImagePatchResult:
+    deployment: str
+    container: str
+    tag: str
+    image: str = None
+    action: str = None
+    error: Exception = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.action != ACTION_SKIPPED
+
+
 class DeploymentManager:
-    def __init__(self, namespace, configuration=None):
+    def __init__(
+            self,
+            namespace,
+            configuration=None,
+            api_client=None,
+            deployment_informer: Informer = None,
+            replica_set_informer: Informer = None
+    ):
+        """
+        When synced informers are given, reads are served from their local store instead of the API server.
+        """
         self.__namespace = namespace
-        self.__api_client = client.ApiClient(configuration=configuration)
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__apps_client = client.AppsV1Api(self.__api_client)
+        self.__deployment_informer = deployment_informer
+        self.__replica_set_informer = replica_set_informer
+
+    def start_informers(self, indexes=('cluster_uuid',), timeout: float = None):
+        """
+        Start watch-backed informers for Deployments and ReplicaSets, ReplicaSets indexed by the given labels.
+        Returns (deployment_informer, replica_set_informer) so they can be shared with other managers.
+        """
+        self.__deployment_informer = Informer(
+            self.__apps_client.list_namespaced_deployment,
+            namespace=self.__namespace
+        ).start()
+        self.__replica_set_informer = Informer(
+            self.__apps_client.list_namespaced_replica_set,
+            namespace=self.__namespace,
+            indexes=indexes
+        ).start()
+        self.__deployment_informer.wait_for_sync(timeout)
+        self.__replica_set_informer.wait_for_sync(timeout)
+        return self.__deployment_informer, self.__replica_set_informer
+
+    def stop_informers(self):
+        for informer in (self.__deployment_informer, self.__replica_set_informer):
+            if informer is not None:
+                informer.stop()
+        self.__deployment_informer = None
+        self.__replica_set_informer = None
 
     def create(self, deployment_yaml: str):
         return self.__apps_client.create_namespaced_deployment(
-            body=yaml.safe_load(deployment_yaml),
+            body=as_body(deployment_yaml),
             namespace=self.__namespace
         )
 
     def list_replicaset(self):
         return self.__apps_client.list_namespaced_replica_set(self.__namespace)
 
+    def iter_replicaset(
+            self,
+            label_selector: str = None,
+            field_selector: str = None,
+            page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        return iterate_pages(
+            self.__apps_client.list_namespaced_replica_set,
+            page_size=page_size,
+            namespace=self.__namespace,
+            label_selector=label_selector,
+            field_selector=field_selector
+        )
+
     def delete_zero_ready_replicaset(self, cluster_uuid):
-        replicas = self.list_replicaset()
-        for rs in replicas.items:
+        informer = self.__replica_set_informer
+        if informer is not None and informer.has_synced and informer.has_index('cluster_uuid'):
+            replica_sets = informer.by_index('cluster_uuid', cluster_uuid)
+        else:
+            replica_sets = self.iter_replicaset(label_selector=f'cluster_uuid={cluster_uuid}')
+        for rs in replica_sets:
             if cluster_uuid == rs.metadata.labels.get('cluster_uuid'):
                 if not rs.status.ready_replicas or rs.spec.replicas == 0:
                     self.__apps_client.delete_namespaced_replica_set(name=rs.metadata.name, namespace=self.__namespace)
@@ -31,10 +144,24 @@ class DeploymentManager:
     def list_namespaced_deployment(self):
         return self.__apps_client.list_namespaced_deployment(namespace=self.__namespace)
 
+    def iter_namespaced_deployment(
+            self,
+            label_selector: str = None,
+            field_selector: str = None,
+            page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        return iterate_pages(
+            self.__apps_client.list_namespaced_deployment,
+            page_size=page_size,
+            namespace=self.__namespace,
+            label_selector=label_selector,
+            field_selector=field_selector
+        )
+
     def patch(self, name: str, deployment_yaml: str):
         return self.__apps_client.patch_namespaced_deployment(
             name=name,
-            body=yaml.safe_load(deployment_yaml),
+            body=as_body(deployment_yaml),
             namespace=self.__namespace
         )
 
@@ -46,6 +173,15 @@ class DeploymentManager:
         )
 
     def read_namespaced_deployment_status(self, name: str):
+        """
+        From the informer when synced, as a copy the caller may modify. A deployment it has not seen yet, e.g. just
+        created, is read from the server.
+        """
+        informer = self.__deployment_informer
+        if informer is not None and informer.has_synced:
+            deployment = informer.get(name)
+            if deployment is not None:
+                return copy.deepcopy(deployment)
         return self.__apps_client.read_namespaced_deployment_status(
             name=name,
             namespace=self.__namespace
@@ -82,31 +218,155 @@ class DeploymentManager:
         )
 
     def patch_image_tag(self, tag_value: str, name: str, image_name_in_container=None):
-        response = self.__apps_client.read_namespaced_deployment(
-            name=name,
-            namespace=self.__namespace
-        )
-        component=None
+        response = self.__get_deployment(name)
         if image_name_in_container:
-            for j in response.spec.template.spec.containers:
-                if image_name_in_container in j.image:
-                    image = j.image
-                    component=j.name
-                    break
-            else:
-                logger.error("Error in patching image {}".format([name,tag_value,image_name_in_container]))
+            container = _find_container(response, image_name_in_container)
+            if container is None:
+                logger.error("Error in patching image {}".format([name, tag_value, image_name_in_container]))
                 return
         else:
-            image = response.spec.template.spec.containers[0].image
-        image_tag_version = image.split(':')
-        image_tag_version[1] = tag_value
-        tag = ':'.join(image_tag_version)
-        if not component:
-            component = name.split('-')[-1]
+            container = response.spec.template.spec.containers[0]
         return self.__apps_client.patch_namespaced_deployment(
             name=name,
             namespace=self.__namespace,
             body={
-                "spec": {"template": {"spec": {"containers": [{"name": component, "image": tag}]}}}
+                "spec": {"template": {"spec": {"containers": [
+                    {"name": container.name, "image": replace_image_tag(container.image, tag_value)}
+                ]}}}
+            }
+        )
+
+    def patch_image_tags(
+            self,
+            updates,
+            max_workers: int = DEFAULT_MAX_WORKERS,
+            wave_size: int = None,
+            wait: bool = False,
+            timeout: float = DEFAULT_TIMEOUT,
+            on_progress=None,
+            stop_on_error: bool = True
+    ) -> List[ImagePatchResult]:
+        """
+        Set the image tag of many containers, updates being (deployment, container, tag) tuples.
+        Deployments are resolved from the informer when synced, otherwise with one paged list, and all updates of a
+        deployment go out as one strategic merge patch. Patches are sent up to max_workers at a time, in waves of
+        wave_size deployments (all at once by default). With wait, every wave waits for its rollouts to complete
+        before the next starts, timeout applying per wave. With stop_on_error, waves after a failure are skipped.
+        Returns one ImagePatchResult per update, in input order.
+        """
+        results = [ImagePatchResult(deployment=name, container=container, tag=tag) for name, container, tag in updates]
+        deployments = self.__get_deployments({result.deployment for result in results})
+        results_by_deployment = dict()
+        for result in results:
+            self.__resolve_image(result, deployments.get(result.deployment))
+            if result.error is None:
+                results_by_deployment.setdefault(result.deployment, list()).append(result)
+        names = [
+            name for name, deployment_results in results_by_deployment.items()
+            if any(result.action is None for result in deployment_results)
+        ]
+        wave_size = wave_size or len(names) or 1
+        failed = any(result.error is not None for result in results)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-rollout') as executor:
+            for start in range(0, len(names), wave_size):
+                wave = names[start:start + wave_size]
+                if failed and stop_on_error:
+                    for name in wave:
+                        self.__set_action(results_by_deployment[name], ACTION_SKIPPED)
+                    continue
+                patched = [
+                    name for name, ok in zip(
+                        wave,
+                        executor.map(lambda name: self.__patch_images(name, results_by_deployment[name]), wave)
+                    ) if ok
+                ]
+                failed = failed or len(patched) < len(wave)
+                if wait and patched:
+                    failed = not self.__wait_for_rollout(patched, results_by_deployment, timeout, on_progress) or failed
+        return results
+
+    def __get_deployment(self, name: str):
+        """
+        From the informer when synced, shared with its cache and read-only. A deployment it has not seen yet, e.g. just
+        created, is read from the server.
+        """
+        informer = self.__deployment_informer
+        if informer is not None and informer.has_synced:
+            deployment = informer.get(name)
+            if deployment is not None:
+                return deployment
+        return self.__apps_client.read_namespaced_deployment(name=name, namespace=self.__namespace)
+
+    def __get_deployments(self, names: set) -> dict:
+        informer = self.__deployment_informer
+        if informer is None or not informer.has_synced:
+            return {
+                deployment.metadata.name: deployment for deployment in self.iter_namespaced_deployment()
+                if deployment.metadata.name in names
             }
-        )
\ No newline at end of file
+        deployments = dict()
+        for name in names:
+            try:
+                deployments[name] = self.__get_deployment(name)
+            except client.ApiException as e:
+                if e.status != HTTP_STATUS_NOT_FOUND:
+                    raise
+        return deployments
+
+    @staticmethod
+    def __resolve_image(result: ImagePatchResult, deployment):
+        if deployment is None:
+            result.action = ACTION_FAILED
+            result.error = Exception(f'Deployment {result.deployment} not found.')
+            return
+        container = _find_container(deployment, result.container)
+        if container is None:
+            result.action = ACTION_FAILED
+            result.error = Exception(f'Container {result.container} not found in deployment {result.deployment}.')
+            return
+        result.container = container.name
+        result.image = replace_image_tag(container.image, result.tag)
+        if result.image == container.image:
+            result.action = ACTION_UNCHANGED
+
+    @staticmethod
+    def __set_action(results, action, error=None, current=None):
+        """
+        Set action and error on the results whose action is current, results already settled keep theirs.
+        """
+        for result in results:
+            if result.action == current:
+                result.action = action
+                result.error = error
+
+    def __patch_images(self, name: str, results) -> bool:
+        containers = {result.container: result.image for result in results if result.action is None}
+        try:
+            self.__apps_client.patch_namespaced_deployment(
+                name=name,
+                namespace=self.__namespace,
+                body={
+                    'spec': {'template': {'spec': {'containers': [
+                        {'name': container, 'image': image} for container, image in containers.items()
+                    ]}}}
+                }
+            )
+        except Exception as e:
+            logger.error(f'DeploymentManager: Failed to patch images of {name}: {e}')
+            self.__set_action(results, ACTION_FAILED, error=e)
+            return False
+        self.__set_action(results, ACTION_PATCHED)
+        return True
+
+    def __wait_for_rollout(self, names, results_by_deployment, timeout, on_progress) -> bool:
+        try:
+            RolloutWaiter(self.__namespace, api_client=self.__api_client).wait(
+                KIND_DEPLOYMENT, names, timeout=timeout, on_progress=on_progress
+            )
+        except Exception as e:
+            logger.error(f'DeploymentManager: Rollout of {", ".join(names)} did not complete: {e}')
+            for name in names:
+                # Only the patched containers failed to roll out, unchanged ones were never touched.
+                self.__set_action(results_by_deployment[name], ACTION_FAILED, error=e, current=ACTION_PATCHED)
+            return False
+        return True
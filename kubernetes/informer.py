@@ -0,0 +1,136 @@
+import logging
+import threading
+
+from kubernetes import client, watch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+WATCH_TIMEOUT_SECONDS = 300
+RETRY_DELAY_SECONDS = 5
+HTTP_STATUS_GONE = 410
+
+
+class Informer:
+    """
+    Keep a local, read-only copy of a namespaced collection up to date.
+    Does an initial list, then watches from its resourceVersion and relists when the server answers 410 Gone.
+    Objects are indexed by name and by the values of every label in indexes. get, list and by_index return the cached
+    objects themselves, callers must not modify them.
+    list_func is a namespaced list call of a generated API, e.g. AppsV1Api.list_namespaced_deployment.
+    """
+
+    def __init__(self, list_func, namespace: str, indexes=(), watch_timeout: int = WATCH_TIMEOUT_SECONDS):
+        self.__list_func = list_func
+        self.__namespace = namespace
+        self.__watch_timeout = watch_timeout
+        self.__lock = threading.Lock()
+        self.__objects = dict()
+        self.__indexes = {label: dict() for label in indexes}
+        self.__resource_version = None
+        self.__synced = threading.Event()
+        self.__stopped = threading.Event()
+        self.__watch = None
+        self.__thread = None
+
+    def start(self):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__watch is not None:
+            self.__watch.stop()
+
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        return self.__synced.wait(timeout)
+
+    @property
+    def has_synced(self) -> bool:
+        return self.__synced.is_set()
+
+    def has_index(self, label: str) -> bool:
+        return label in self.__indexes
+
+    def get(self, name: str):
+        with self.__lock:
+            return self.__objects.get(name)
+
+    def list(self) -> list:
+        with self.__lock:
+            return list(self.__objects.values())
+
+    def by_index(self, label: str, value: str) -> list:
+        with self.__lock:
+            names = self.__indexes[label].get(value, ())
+            return [self.__objects[name] for name in names]
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            try:
+                if self.__resource_version is None:
+                    self.__relist()
+                self.__watch_once()
+            except client.ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    logger.info(f'Informer: resourceVersion {self.__resource_version} expired, relisting.')
+                    self.__resource_version = None
+                    continue
+                logger.error(f'Informer: Watch failed in namespace {self.__namespace}: {e}')
+                self.__stopped.wait(RETRY_DELAY_SECONDS)
+            except Exception as e:
+                logger.error(f'Informer: Watch failed in namespace {self.__namespace}: {e}')
+                self.__stopped.wait(RETRY_DELAY_SECONDS)
+
+    def __relist(self):
+        response = self.__list_func(namespace=self.__namespace)
+        with self.__lock:
+            self.__objects.clear()
+            for index in self.__indexes.values():
+                index.clear()
+            for obj in response.items:
+                self.__add(obj)
+        self.__resource_version = response.metadata.resource_version
+        self.__synced.set()
+
+    def __watch_once(self):
+        self.__watch = watch.Watch()
+        for event in self.__watch.stream(
+                self.__list_func,
+                namespace=self.__namespace,
+                resource_version=self.__resource_version,
+                timeout_seconds=self.__watch_timeout,
+                allow_watch_bookmarks=True
+        ):
+            obj = event['object']
+            self.__resource_version = obj.metadata.resource_version
+            if event['type'] == 'BOOKMARK':
+                continue
+            with self.__lock:
+                self.__remove(obj.metadata.name)
+                if event['type'] != 'DELETED':
+                    self.__add(obj)
+            if self.__stopped.is_set():
+                break
+
+    def __add(self, obj):
+        name = obj.metadata.name
+        self.__objects[name] = obj
+        labels = obj.metadata.labels or {}
+        for label, index in self.__indexes.items():
+            if label in labels:
+                index.setdefault(labels[label], set()).add(name)
+
+    def __remove(self, name):
+        obj = self.__objects.pop(name, None)
+        if obj is None:
+            return
+        labels = obj.metadata.labels or {}
+        for label, index in self.__indexes.items():
+            names = index.get(labels.get(label))
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del index[labels[label]]
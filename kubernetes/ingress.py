@@ -1,9 +1,12 @@
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
 
 
 class IngressManager:
-    def __init__(self, namespace):
+    def __init__(self, namespace, configuration=None, api_client=None):
         self.__namespace = namespace
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
+        self.__networking_api = client.NetworkingV1Api(self.__api_client)
 
     def create(self, name: str, host: str, port: int):
         """
@@ -14,7 +17,6 @@ class IngressManager:
         :param port: int
         :return:
         """
-        networking_v1_api = client.NetworkingV1Api()
         body = client.V1Ingress(
             api_version="networking.k8s.io/v1",
             kind="Ingress",
@@ -42,14 +44,13 @@ class IngressManager:
             )
         )
         # Creation of the Deployment in specified namespace
-        return networking_v1_api.create_namespaced_ingress(
+        return self.__networking_api.create_namespaced_ingress(
             namespace=self.__namespace,
             body=body
         )
 
     def delete(self, name: str):
-        networking_v1_api = client.NetworkingV1Api()
-        networking_v1_api.delete_namespaced_ingress(
+        self.__networking_api.delete_namespaced_ingress(
             namespace=self.__namespace,
             name='ingress-%s' % name
         )
@@ -1,11 +1,14 @@
-import yaml
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.pagination import iterate_pages, DEFAULT_PAGE_SIZE
+from kubernetes.manifest import as_body
 
 
 class JobManager:
-    def __init__(self, namespace: str):
+    def __init__(self, namespace: str, configuration=None, api_client=None):
         self.__namespace = namespace
-        self.__batch_api = client.BatchV1Api()
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
+        self.__batch_api = client.BatchV1Api(self.__api_client)
 
     def create(
             self,
@@ -17,7 +20,7 @@ class JobManager:
         :param yaml_content:
         :return:
         """
-        dep = yaml.safe_load(yaml_content)
+        dep = as_body(yaml_content)
         return self.__batch_api.create_namespaced_job(self.__namespace, dep)
 
     def delete(
@@ -32,3 +35,16 @@ class JobManager:
     def list_namespaced_job(self):
         return self.__batch_api.list_namespaced_job(namespace=self.__namespace)
 
+    def iter_namespaced_job(
+            self,
+            label_selector: str = None,
+            field_selector: str = None,
+            page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        return iterate_pages(
+            self.__batch_api.list_namespaced_job,
+            page_size=page_size,
+            namespace=self.__namespace,
+            label_selector=label_selector,
+            field_selector=field_selector
+        )
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+DEFAULT_CACHE_SIZE = 256
+
+
+def _copy(obj):
+    """
+    Copy of a parsed document, much cheaper than copy.deepcopy since it only holds dicts, lists and scalars.
+    """
+    if isinstance(obj, dict):
+        return {k: _copy(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_copy(v) for v in obj]
+    if isinstance(obj, set):
+        return set(obj)
+    return obj
+
+
+class ManifestCache:
+    """
+    LRU cache of parsed YAML manifests keyed by a hash of their content.
+    Parsing uses libyaml's CSafeLoader when PyYAML was built with it. Every caller gets its own copy,
+    so the result is safe to mutate.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.__max_size = max_size
+        self.__lock = threading.Lock()
+        self.__documents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, content: str):
+        return _copy(self.__get(content, single=True))
+
+    def load_all(self, content: str) -> list:
+        return [_copy(document) for document in self.__get(content, single=False)]
+
+    def __get(self, content, single):
+        key = (single, hashlib.sha256(content.encode()).hexdigest())
+        with self.__lock:
+            document = self.__documents.get(key)
+            if document is not None:
+                self.__documents.move_to_end(key)
+                self.hits += 1
+                return document
+            self.misses += 1
+        if single:
+            document = yaml.load(content, Loader=SafeLoader)
+        else:
+            document = list(yaml.load_all(content, Loader=SafeLoader))
+        with self.__lock:
+            self.__documents[key] = document
+            if len(self.__documents) > self.__max_size:
+                self.__documents.popitem(last=False)
+        return document
+
+    def clear(self):
+        with self.__lock:
+            self.__documents.clear()
+
+
+manifest_cache = ManifestCache()
+
+
+def load_manifest(content: str):
+    return manifest_cache.load(content)
+
+
+def load_all_manifests(content: str) -> list:
+    return manifest_cache.load_all(content)
+
+
+def as_body(manifest):
+    """
+    Request body from a YAML string, dicts and V1* objects are passed through unchanged.
+    """
+    if isinstance(manifest, str):
+        return load_manifest(manifest)
+    return manifest
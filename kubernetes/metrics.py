@@ -0,0 +1,212 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+API_REQUEST_DURATION = 'kube_api_request_duration_seconds'
+API_REQUESTS = 'kube_api_requests_total'
+API_REQUEST_ERRORS = 'kube_api_request_errors_total'
+API_REQUEST_SIZE = 'kube_api_request_size_bytes'
+API_RESPONSE_SIZE = 'kube_api_response_size_bytes'
+CONFIG_BUILD_STEP_DURATION = 'kube_config_build_step_duration_seconds'
+CONFIG_BUILD_STEP_ERRORS = 'kube_config_build_step_errors_total'
+
+_COUNTER = 'counter'
+_HISTOGRAM = 'histogram'
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{%s}' % ','.join(f'{k}="{_escape(v)}"' for k, v in items)
+
+
+@contextmanager
+def _null_timer():
+    yield
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms exportable in Prometheus text format.
+    Disabled by default; when disabled every call returns right away without recording anything.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.__lock = threading.Lock()
+        self.__metrics = dict()
+        self.__clusters = dict()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.__lock:
+            self.__metrics.clear()
+
+    def __series(self, name, kind, labels, buckets=None):
+        metric = self.__metrics.setdefault(name, (kind, dict()))
+        key = tuple(sorted(labels.items()))
+        series = metric[1].get(key)
+        if series is None:
+            series = metric[1][key] = _Histogram(buckets) if kind == _HISTOGRAM else 0
+        return metric[1], key, series
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        with self.__lock:
+            series, key, current = self.__series(name, _COUNTER, labels)
+            series[key] = current + value
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__series(name, _HISTOGRAM, labels, buckets)[2].observe(value)
+
+    def timer(self, name: str, errors_name: str = None, **labels):
+        """
+        Context manager observing its duration in the name histogram and counting exceptions in errors_name.
+        """
+        if not self.enabled:
+            return _null_timer()
+        return self.__timer(name, errors_name, labels)
+
+    @contextmanager
+    def __timer(self, name, errors_name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if errors_name:
+                self.inc(errors_name, **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_cluster(self, host: str, cloud: str, cluster: str):
+        """
+        Label API calls to host with its cloud and cluster name.
+        """
+        self.__clusters[host] = (cloud, cluster)
+
+    def cluster_labels(self, host: str) -> tuple:
+        return self.__clusters.get(host, ('', host))
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self.__lock:
+            for name in sorted(self.__metrics):
+                kind, series = self.__metrics[name]
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in sorted(series.items()):
+                    if kind == _COUNTER:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {value.count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {value.sum}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {value.count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+def api_resource_and_verb(method: str, url: str, query_params=None) -> tuple:
+    """
+    Resource (with subresource, e.g. deployments/scale) and Kubernetes verb of an API request.
+    """
+    parts = [part for part in urlparse(url).path.split('/') if part]
+    if parts[:1] == ['api']:
+        parts = parts[2:]
+    elif parts[:1] == ['apis']:
+        parts = parts[3:]
+    if parts[:1] == ['namespaces'] and len(parts) >= 3:
+        parts = parts[2:]
+    resource = parts[0] if parts else ''
+    named = len(parts) > 1
+    if len(parts) > 2:
+        resource = f'{resource}/{parts[2]}'
+    method = method.upper()
+    if method == 'GET':
+        watching = any(key == 'watch' and value for key, value in (query_params or []))
+        verb = 'watch' if watching else ('get' if named else 'list')
+    elif method == 'DELETE':
+        verb = 'delete' if named else 'deletecollection'
+    else:
+        verb = {'POST': 'create', 'PUT': 'update', 'PATCH': 'patch'}.get(method, method.lower())
+    return resource, verb
+
+
+def observe_api_request(host, method, url, query_params, body, response, status, seconds):
+    cloud, cluster = metrics.cluster_labels(host)
+    resource, verb = api_resource_and_verb(method, url, query_params)
+    labels = dict(cloud=cloud, cluster=cluster, kind=resource, verb=verb)
+    metrics.observe(API_REQUEST_DURATION, seconds, **labels)
+    metrics.inc(API_REQUESTS, code=str(status), **labels)
+    if status is None or status >= 400:
+        metrics.inc(API_REQUEST_ERRORS, code=str(status), **labels)
+    if body is not None:
+        metrics.observe(API_REQUEST_SIZE, len(json.dumps(body, default=str)), buckets=SIZE_BUCKETS, **labels)
+    size = _response_size(response)
+    if size is not None:
+        metrics.observe(API_RESPONSE_SIZE, size, buckets=SIZE_BUCKETS, **labels)
+
+
+def _response_size(response):
+    """
+    Body size of a preloaded RESTResponse. A _preload_content=False response is a raw urllib3 HTTPResponse whose
+    .data would block until the stream ends and consume it, only its Content-Length header is used.
+    """
+    if response is None:
+        return None
+    if getattr(response, 'urllib3_response', None) is not None:
+        data = response.data
+        return len(data) if isinstance(data, (bytes, str)) else None
+    headers = getattr(response, 'headers', None)
+    length = headers.get('Content-Length') if headers is not None else None
+    try:
+        return int(length) if length is not None else None
+    except ValueError:
+        return None
+
+
+def config_build_step(cloud: str, cluster: str, step: str):
+    """
+    Timer for one step of a cluster Configuration builder.
+    """
+    return metrics.timer(CONFIG_BUILD_STEP_DURATION, CONFIG_BUILD_STEP_ERRORS, cloud=cloud, cluster=cluster, step=step)
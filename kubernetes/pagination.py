@@ -0,0 +1,15 @@
+DEFAULT_PAGE_SIZE = 500
+
+
+def iterate_pages(list_func, page_size: int = DEFAULT_PAGE_SIZE, **kwargs):
+    """
+    Yield the items of a list call page by page using limit and _continue,
+    so only one page is held in memory regardless of the collection size.
+    """
+    while True:
+        response = list_func(limit=page_size, **kwargs)
+        yield from response.items
+        continue_token = response.metadata._continue
+        if not continue_token:
+            return
+        kwargs['_continue'] = continue_token
@@ -0,0 +1,66 @@
+import base64
+import gzip
+import re
+
+PROPERTIES_KEY = 'config.properties'
+COMPRESSED_PROPERTIES_KEY = 'config.properties.gz'
+MAX_CONFIG_MAP_BYTES = 1024 * 1024
+# Payloads above this size are compressed, then sharded, leaving room for metadata under MAX_CONFIG_MAP_BYTES.
+PAYLOAD_THRESHOLD_BYTES = 900 * 1024
+
+_INT = re.compile(r'(0|-?[1-9][0-9]*)\Z')
+_BOOLS = {
+    'true': True,
+    'false': False,
+    'True': True,
+    'False': False,
+}
+
+
+def decode_value(value: str):
+    """
+    'true'/'false' (and 'True'/'False') become bool, canonical integers become int, anything else stays str.
+    """
+    if value in _BOOLS:
+        return _BOOLS[value]
+    if _INT.match(value):
+        return int(value)
+    return value
+
+
+def encode_value(value) -> str:
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return str(value)
+
+
+def dumps(properties: dict) -> str:
+    return '\n'.join([f'{key}={encode_value(value)}' for key, value in properties.items()])
+
+
+def loads(content: str) -> dict:
+    properties = dict()
+    for line in content.split('\n'):
+        if not line.strip():
+            continue
+        key, _, value = line.partition('=')
+        properties[key] = decode_value(value)
+    return properties
+
+
+def compress(content: str) -> str:
+    """
+    Returns gzip compressed content, base64 encoded as ConfigMap binaryData expects.
+    mtime is fixed so equal content always compresses to the same bytes.
+    """
+    return base64.b64encode(gzip.compress(content.encode(), mtime=0)).decode()
+
+
+def decompress(content: str) -> str:
+    return gzip.decompress(base64.b64decode(content)).decode()
+
+
+def split(content: str, size: int = PAYLOAD_THRESHOLD_BYTES) -> list:
+    return [content[i:i + size] for i in range(0, len(content), size)]
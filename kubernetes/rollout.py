@@ -0,0 +1,193 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from kubernetes import client, watch
+from kubernetes.api_client_registry import get_api_client
+
+KIND_DAEMON_SET = 'DaemonSet'
+KIND_DEPLOYMENT = 'Deployment'
+KIND_STATEFUL_SET = 'StatefulSet'
+KIND_JOB = 'Job'
+
+DEFAULT_TIMEOUT = 360  # Seconds
+HTTP_STATUS_GONE = 410
+UPDATE_STRATEGY_ON_DELETE = 'OnDelete'
+
+
+class RolloutTimeout(Exception):
+    pass
+
+
+class RolloutFailed(Exception):
+    pass
+
+
+def _is_observed(obj) -> bool:
+    return (obj.status.observed_generation or 0) >= (obj.metadata.generation or 0)
+
+
+def _daemon_set_status(obj):
+    """
+    Ready when the controller has observed the latest spec and every scheduled pod is ready and runs the current
+    template. Stricter than DaemonSetManager.watcher used to be, which only compared the scheduled and ready counts.
+    OnDelete DaemonSets only replace pods deleted by hand, their updated count is not checked.
+    """
+    status = dict(
+        desired_number_scheduled=obj.status.desired_number_scheduled or 0,
+        current_number_scheduled=obj.status.current_number_scheduled or 0,
+        updated_number_scheduled=obj.status.updated_number_scheduled or 0,
+        number_ready=obj.status.number_ready or 0,
+    )
+    update_strategy = obj.spec.update_strategy
+    on_delete = update_strategy is not None and update_strategy.type == UPDATE_STRATEGY_ON_DELETE
+    ready = _is_observed(obj) and status['number_ready'] > 0 and (
+        status['desired_number_scheduled']
+        == status['current_number_scheduled']
+        == status['number_ready']
+    ) and (on_delete or status['updated_number_scheduled'] == status['number_ready'])
+    return ready, status
+
+
+def _deployment_status(obj):
+    status = dict(
+        replicas=obj.spec.replicas if obj.spec.replicas is not None else 1,
+        updated_replicas=obj.status.updated_replicas or 0,
+        available_replicas=obj.status.available_replicas or 0,
+        total_replicas=obj.status.replicas or 0,
+    )
+    ready = _is_observed(obj) and (
+        status['replicas']
+        == status['updated_replicas']
+        == status['available_replicas']
+        == status['total_replicas']
+    )
+    return ready, status
+
+
+def _stateful_set_status(obj):
+    status = dict(
+        replicas=obj.spec.replicas if obj.spec.replicas is not None else 1,
+        updated_replicas=obj.status.updated_replicas or 0,
+        ready_replicas=obj.status.ready_replicas or 0,
+    )
+    ready = _is_observed(obj) and status['replicas'] == status['updated_replicas'] == status['ready_replicas']
+    return ready, status
+
+
+def _job_status(obj):
+    status = dict(
+        completions=obj.spec.completions or 1,
+        succeeded=obj.status.succeeded or 0,
+        failed=obj.status.failed or 0,
+    )
+    for condition in obj.status.conditions or []:
+        if condition.type == 'Failed' and condition.status == 'True':
+            raise RolloutFailed(f'Job {obj.metadata.name} failed: {condition.message}')
+    return status['succeeded'] >= status['completions'], status
+
+
+_STATUS_FUNCS = {
+    KIND_DAEMON_SET: _daemon_set_status,
+    KIND_DEPLOYMENT: _deployment_status,
+    KIND_STATEFUL_SET: _stateful_set_status,
+    KIND_JOB: _job_status,
+}
+
+
+class RolloutWaiter:
+    """
+    Wait for DaemonSets, Deployments, StatefulSets and Jobs to become ready, driven by the watch stream.
+    All objects of one kind are waited on with a single watch; on_progress(kind, name, status) is called
+    on every change of a pending object.
+    """
+
+    def __init__(self, namespace, configuration=None, api_client=None):
+        self.__namespace = namespace
+        api_client = get_api_client(configuration=configuration, api_client=api_client)
+        apps_client = client.AppsV1Api(api_client)
+        batch_client = client.BatchV1Api(api_client)
+        self.__list_funcs = {
+            KIND_DAEMON_SET: apps_client.list_namespaced_daemon_set,
+            KIND_DEPLOYMENT: apps_client.list_namespaced_deployment,
+            KIND_STATEFUL_SET: apps_client.list_namespaced_stateful_set,
+            KIND_JOB: batch_client.list_namespaced_job,
+        }
+
+    def wait(self, kind: str, names, timeout: float = DEFAULT_TIMEOUT, on_progress=None) -> bool:
+        """
+        Block until every named object of kind is ready. Raises RolloutTimeout after timeout seconds.
+        """
+        return self.__wait(kind, set(names), time.monotonic() + timeout, on_progress)
+
+    def wait_many(self, objects, timeout: float = DEFAULT_TIMEOUT, on_progress=None) -> bool:
+        """
+        Block until every (kind, name) in objects is ready, with one watch per kind running concurrently.
+        """
+        names_by_kind = dict()
+        for kind, name in objects:
+            names_by_kind.setdefault(kind, set()).add(name)
+        deadline = time.monotonic() + timeout
+        with ThreadPoolExecutor(max_workers=max(len(names_by_kind), 1)) as executor:
+            futures = [
+                executor.submit(self.__wait, kind, names, deadline, on_progress)
+                for kind, names in names_by_kind.items()
+            ]
+            for future in futures:
+                future.result()
+        return True
+
+    def __wait(self, kind, pending, deadline, on_progress):
+        if kind not in _STATUS_FUNCS:
+            raise Exception(f'Unsupported kind {kind}. Supported kind {" or ".join(_STATUS_FUNCS)}.')
+        list_func = self.__list_funcs[kind]
+        selector = dict()
+        if len(pending) == 1:
+            selector['field_selector'] = 'metadata.name=%s' % next(iter(pending))
+        resource_version = None
+        while pending:
+            if resource_version is None:
+                response = list_func(namespace=self.__namespace, **selector)
+                for obj in response.items:
+                    self.__check(kind, obj, pending, on_progress)
+                resource_version = response.metadata.resource_version
+                if not pending:
+                    break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RolloutTimeout(f'Timed out waiting for {kind} {", ".join(sorted(pending))}.')
+            stream = watch.Watch()
+            try:
+                for event in stream.stream(
+                        list_func,
+                        namespace=self.__namespace,
+                        resource_version=resource_version,
+                        timeout_seconds=max(int(remaining), 1),
+                        allow_watch_bookmarks=True,
+                        **selector
+                ):
+                    obj = event['object']
+                    resource_version = obj.metadata.resource_version
+                    if event['type'] == 'BOOKMARK' or obj.metadata.name not in pending:
+                        continue
+                    if event['type'] == 'DELETED':
+                        raise RolloutFailed(f'{kind} {obj.metadata.name} was deleted.')
+                    self.__check(kind, obj, pending, on_progress)
+                    if not pending:
+                        stream.stop()
+                        break
+            except client.ApiException as e:
+                if e.status != HTTP_STATUS_GONE:
+                    raise
+                resource_version = None
+        return True
+
+    @staticmethod
+    def __check(kind, obj, pending, on_progress):
+        name = obj.metadata.name
+        if name not in pending:
+            return
+        ready, status = _STATUS_FUNCS[kind](obj)
+        if on_progress is not None:
+            on_progress(kind, name, status)
+        if ready:
+            pending.discard(name)
@@ -1,10 +1,11 @@
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
 
 
 class SecretManager:
-    def __init__(self, namespace, configuration=None, request_timeout=5):
+    def __init__(self, namespace, configuration=None, request_timeout=5, api_client=None):
         self.__namespace = namespace
-        self.__api_client = client.ApiClient(configuration=configuration)
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__core_client = client.CoreV1Api(self.__api_client)
         self._request_timeout = request_timeout  # seconds
 
@@ -1,7 +1,9 @@
 from typing import List
 
-import yaml
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.pagination import iterate_pages, DEFAULT_PAGE_SIZE
+from kubernetes.manifest import as_body
 from kubernetes.utils import BaseModel, KeyValueModel
 
 
@@ -9,17 +11,17 @@ class ServiceManager(BaseModel):
     SERVICE_TYPE_LOAD_BALANCER = 'LoadBalancer'
     SERVICE_TYPE_CLUSTER_IP = 'ClusterIP'
 
-    def __init__(self, namespace, configuration=None):
+    def __init__(self, namespace, configuration=None, api_client=None):
         super().__init__()
         self.__namespace = namespace
-        self.__api_client = client.ApiClient(configuration=configuration)
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__core_client = client.CoreV1Api(self.__api_client)
         self.__supported_service_type = [
             self.SERVICE_TYPE_LOAD_BALANCER,
             self.SERVICE_TYPE_CLUSTER_IP
         ]
 
-    def get_yaml(self, name: str, service_type: str, target_port: int, labels: List[KeyValueModel]) -> str:
+    def __check_service_type(self, service_type: str):
         if service_type not in self.__supported_service_type:
             raise Exception(
                 'Unsupported service type. Supported service type {supported_service_type}. Found {service_type}.'.format(
@@ -27,6 +29,28 @@ class ServiceManager(BaseModel):
                     service_type=service_type
                 )
             )
+
+    def get_body(self, name: str, service_type: str, target_port: int, labels: List[KeyValueModel]) -> dict:
+        """
+        Same Service as get_yaml, built directly as the request body without a YAML round trip.
+        """
+        self.__check_service_type(service_type)
+        return {
+            'apiVersion': 'v1',
+            'kind': 'Service',
+            'metadata': {
+                'name': name,
+                'labels': self.get_key_value_labels(data=labels),
+            },
+            'spec': {
+                'type': service_type,
+                'ports': [{'port': 80, 'targetPort': target_port, 'protocol': 'TCP', 'name': 'http'}],
+                'selector': self.get_key_value_labels(data=labels),
+            },
+        }
+
+    def get_yaml(self, name: str, service_type: str, target_port: int, labels: List[KeyValueModel]) -> str:
+        self.__check_service_type(service_type)
         return """
 apiVersion: v1
 kind: Service
@@ -50,9 +74,12 @@ spec:
             labels=self.get_key_value_params_labels(data=labels, indent_line=4),
         )
 
-    def create(self, service_yaml: str):
+    def create(self, service_yaml):
+        """
+        service_yaml is a YAML string or an already built body such as get_body returns.
+        """
         return self.__core_client.create_namespaced_service(
-            body=yaml.safe_load(service_yaml),
+            body=as_body(service_yaml),
             namespace=self.__namespace
         )
     def read_namespaced_service_status(self, name: str):
@@ -66,10 +93,24 @@ spec:
             namespace=self.__namespace
         )
 
-    def patch(self, name: str, service_yaml: str):
+    def iter_namespaced_service(
+            self,
+            label_selector: str = None,
+            field_selector: str = None,
+            page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        return iterate_pages(
+            self.__core_client.list_namespaced_service,
+            page_size=page_size,
+            namespace=self.__namespace,
+            label_selector=label_selector,
+            field_selector=field_selector
+        )
+
+    def patch(self, name: str, service_yaml):
         return self.__core_client.patch_namespaced_service(
             name=name,
-            body=yaml.safe_load(service_yaml),
+            body=as_body(service_yaml),
             namespace=self.__namespace
         )
 
@@ -1,10 +1,11 @@
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
 
 
 class ServiceAccountManager:
-    def __init__(self, namespace):
+    def __init__(self, namespace, configuration=None, api_client=None):
         self.__namespace = namespace
-        self.__api_client = client.ApiClient()
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__core_client = client.CoreV1Api(self.__api_client)
 
     def create(self, namespace: str, service_account_name: str):
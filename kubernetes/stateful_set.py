@@ -1,22 +1,23 @@
-import yaml
 from kubernetes import client
+from kubernetes.api_client_registry import get_api_client
+from kubernetes.manifest import as_body
 
 
 class StatefulManager:
-    def __init__(self, namespace):
+    def __init__(self, namespace, configuration=None, api_client=None):
         self.__namespace = namespace
-        self.__api_client = client.ApiClient()
+        self.__api_client = get_api_client(configuration=configuration, api_client=api_client)
         self.__apps_client = client.AppsV1Api(self.__api_client)
 
     def create(self, stateful_set_yaml: str):
         return self.__apps_client.create_namespaced_stateful_set(
-            body=yaml.safe_load(stateful_set_yaml),
+            body=as_body(stateful_set_yaml),
             namespace=self.__namespace
         )
 
     def patch(self, name: str, stateful_set_yaml: str):
         return self.__apps_client.patch_namespaced_stateful_set(
-            body=yaml.safe_load(stateful_set_yaml),
+            body=as_body(stateful_set_yaml),
             namespace=self.__namespace,
             name=name
         )
@@ -0,0 +1,336 @@
+import copy
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+from kubernetes import client
+from kubernetes.metrics import metrics, observe_api_request
+from urllib3.exceptions import HTTPError, SSLError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+DEFAULT_QPS = 20
+DEFAULT_BURST = 40
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 0.5  # Seconds
+DEFAULT_BACKOFF_CAP = 30  # Seconds
+MIN_QPS = 1
+MIN_REQUEST_TIMEOUT = 0.1  # Seconds, an attempt started right at the deadline still gets a chance
+
+# Rejected before being processed (API Priority and Fairness, overload), safe to retry for every verb.
+THROTTLED_STATUSES = (429, 503)
+# May have been processed, retried only for idempotent verbs. POST and PATCH are never retried on these.
+TRANSIENT_STATUSES = (500, 502, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+HTTP_STATUS_UNAUTHORIZED = 401
+AUTHORIZATION_HEADER = 'authorization'
+
+FAILURE_AUTH = 'auth'
+FAILURE_TLS = 'tls'
+
+_failure_callbacks = []
+_local = threading.local()
+
+
+@contextmanager
+def request_deadline(timeout):
+    """
+    Bound the API requests made by this thread inside the block to timeout seconds from now, retries included.
+    Every attempt gets the remaining time as _request_timeout unless the call passed its own, and no retry starts
+    past the deadline. None leaves requests unbounded. Only requests going through a RateLimitedApiClient are bounded.
+    """
+    previous = getattr(_local, 'deadline', None)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if previous is not None and (deadline is None or previous < deadline):
+        deadline = previous
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def add_failure_callback(callback):
+    """
+    Call callback(host, reason, error) whenever a request fails authentication (reason FAILURE_AUTH, after the retry
+    with a refreshed token when the Configuration has a refresher) or the TLS handshake (reason FAILURE_TLS),
+    so cached endpoints, CAs and tokens can be dropped.
+    """
+    if callback not in _failure_callbacks:
+        _failure_callbacks.append(callback)
+
+
+def remove_failure_callback(callback):
+    if callback in _failure_callbacks:
+        _failure_callbacks.remove(callback)
+
+
+def _notify_failure(host, reason, error):
+    for callback in list(_failure_callbacks):
+        try:
+            callback(host, reason, error)
+        except Exception as e:
+            logger.error(f'RateLimitedApiClient: Failure callback {callback} raised {e}')
+
+
+def _is_tls_error(error) -> bool:
+    # The rest client turns a bare SSLError into ApiException(status=0), while urllib3 retries wrap
+    # handshake failures in MaxRetryError with the SSLError as its reason.
+    if isinstance(error, client.ApiException):
+        return error.status == 0 and str(error.reason).startswith('SSLError')
+    return isinstance(error, SSLError) or isinstance(getattr(error, 'reason', None), SSLError)
+
+
+def _retry_after_seconds(headers):
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ClusterThrottle:
+    """
+    Token bucket limiting the QPS and burst of one cluster.
+    The rate is halved on every throttled response and climbs back to qps as requests succeed.
+    """
+
+    def __init__(self, qps: float, burst: int):
+        self.qps = qps
+        self.burst = burst
+        self.__lock = threading.Lock()
+        self.__rate = qps
+        self.__tokens = burst
+        self.__last = time.monotonic()
+        self.requests = 0
+        self.throttled_requests = 0
+        self.throttle_wait_seconds = 0.0
+        self.retries = 0
+        self.gave_up = 0
+        self.responses_by_status = dict()
+
+    @property
+    def rate(self) -> float:
+        return self.__rate
+
+    def acquire(self):
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__last) * self.__rate)
+            self.__last = now
+            self.__tokens -= 1
+            self.requests += 1
+            wait = -self.__tokens / self.__rate if self.__tokens < 0 else 0
+            if wait:
+                self.throttled_requests += 1
+                self.throttle_wait_seconds += wait
+        if wait:
+            time.sleep(wait)
+
+    def on_success(self):
+        if self.__rate < self.qps:
+            with self.__lock:
+                self.__rate = min(self.qps, self.__rate + self.qps * 0.01)
+
+    def on_retry(self):
+        with self.__lock:
+            self.retries += 1
+
+    def on_give_up(self):
+        with self.__lock:
+            self.gave_up += 1
+
+    def on_error(self, status):
+        with self.__lock:
+            self.responses_by_status[status] = self.responses_by_status.get(status, 0) + 1
+            if status in THROTTLED_STATUSES:
+                self.__rate = max(self.__rate / 2, MIN_QPS)
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return dict(
+                qps=self.qps,
+                burst=self.burst,
+                rate=self.__rate,
+                requests=self.requests,
+                throttled_requests=self.throttled_requests,
+                throttle_wait_seconds=self.throttle_wait_seconds,
+                retries=self.retries,
+                gave_up=self.gave_up,
+                responses_by_status=dict(self.responses_by_status),
+            )
+
+
+class ThrottleRegistry:
+    """
+    One ClusterThrottle per API server host plus the retry policy shared by every manager call.
+    """
+
+    def __init__(
+            self,
+            qps: float = DEFAULT_QPS,
+            burst: int = DEFAULT_BURST,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+            backoff_base: float = DEFAULT_BACKOFF_BASE,
+            backoff_cap: float = DEFAULT_BACKOFF_CAP
+    ):
+        self.qps = qps
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.__lock = threading.Lock()
+        self.__throttles = dict()
+
+    def configure(self, host: str, qps: float, burst: int):
+        """
+        Override QPS and burst for one cluster.
+        """
+        with self.__lock:
+            self.__throttles[host] = ClusterThrottle(qps=qps, burst=burst)
+
+    def get(self, host: str) -> ClusterThrottle:
+        with self.__lock:
+            throttle = self.__throttles.get(host)
+            if throttle is None:
+                throttle = self.__throttles[host] = ClusterThrottle(qps=self.qps, burst=self.burst)
+            return throttle
+
+    def retry_delay(self, method: str, status, headers, attempt: int):
+        """
+        Seconds to wait before retrying, None when the request must not be retried.
+        """
+        if status in THROTTLED_STATUSES:
+            retry_after = _retry_after_seconds(headers)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_cap) + random.uniform(0, self.backoff_base)
+        elif not (method.upper() in IDEMPOTENT_METHODS and (status is None or status in TRANSIENT_STATUSES)):
+            return None
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def stats(self) -> dict:
+        """
+        Throttle and retry counters per cluster host.
+        """
+        with self.__lock:
+            throttles = dict(self.__throttles)
+        return {host: throttle.stats() for host, throttle in throttles.items()}
+
+
+throttle_registry = ThrottleRegistry()
+
+
+class RateLimitedApiClient(client.ApiClient):
+    """
+    ApiClient whose every request passes the cluster's token bucket and is retried with jittered exponential
+    backoff on throttling and transient errors, honouring Retry-After. A 401 is retried once right away when the
+    Configuration's refresh_api_key_hook can force a new bearer token.
+    Retries are left to this class: a Configuration without retries is copied with retries = 0, as urllib3's default
+    Retry would multiply every attempt here. One that sets retries allows up to (max_retries + 1) * (retries + 1)
+    attempts.
+    """
+
+    def __init__(self, configuration=None, *args, **kwargs):
+        if configuration is None:
+            configuration = client.Configuration.get_default_copy()
+        if configuration.retries is None:
+            # Configurations are cached and shared, the caller's one is left as it is.
+            configuration = copy.copy(configuration)
+            configuration.retries = 0
+        super().__init__(configuration, *args, **kwargs)
+
+    def request(self, method, url, *args, **kwargs):
+        if not metrics.enabled:
+            return self.__request(method, url, *args, **kwargs)
+        start = time.perf_counter()
+        response, status = None, None
+        try:
+            response = self.__request(method, url, *args, **kwargs)
+            status = response.status
+            return response
+        except client.ApiException as e:
+            status = e.status
+            raise
+        finally:
+            observe_api_request(
+                self.configuration.host, method, url, kwargs.get('query_params'), kwargs.get('body'),
+                response, status, time.perf_counter() - start
+            )
+
+    def __request(self, method, url, *args, **kwargs):
+        throttle = throttle_registry.get(self.configuration.host)
+        attempt = 0
+        token_refreshed = False
+        deadline = getattr(_local, 'deadline', None)
+        bounded = deadline is not None and kwargs.get('_request_timeout') is None
+        while True:
+            throttle.acquire()
+            if bounded:
+                kwargs['_request_timeout'] = max(deadline - time.monotonic(), MIN_REQUEST_TIMEOUT)
+            try:
+                response = super().request(method, url, *args, **kwargs)
+                throttle.on_success()
+                return response
+            except client.ApiException as e:
+                throttle.on_error(e.status)
+                if e.status == HTTP_STATUS_UNAUTHORIZED and not token_refreshed:
+                    token_refreshed = self.__refresh_token(kwargs.get('headers'))
+                    if token_refreshed:
+                        # Rejected before being processed, retry once with the new token right away.
+                        continue
+                if e.status == HTTP_STATUS_UNAUTHORIZED:
+                    _notify_failure(self.configuration.host, FAILURE_AUTH, e)
+                elif _is_tls_error(e):
+                    _notify_failure(self.configuration.host, FAILURE_TLS, e)
+                delay = throttle_registry.retry_delay(method, e.status, e.headers, attempt)
+                error, status, reason = e, e.status, e.reason
+            except HTTPError as e:
+                # Connection level failure, the request may or may not have reached the server.
+                throttle.on_error(None)
+                if _is_tls_error(e):
+                    _notify_failure(self.configuration.host, FAILURE_TLS, e)
+                delay = throttle_registry.retry_delay(method, None, None, attempt)
+                error, status, reason = e, None, type(e).__name__
+            if delay is None:
+                raise error
+            past_deadline = deadline is not None and time.monotonic() + delay >= deadline
+            if attempt >= throttle_registry.max_retries or past_deadline:
+                throttle.on_give_up()
+                logger.warning(
+                    f'RateLimitedApiClient: Giving up on {method} {url} after {attempt + 1} attempts: {error}'
+                )
+                raise error
+            attempt += 1
+            throttle.on_retry()
+            logger.info(
+                f'RateLimitedApiClient: Retrying {method} {url} after {status} {reason}, '
+                f'attempt {attempt} of {throttle_registry.max_retries} in {delay:.2f}s.'
+            )
+            time.sleep(delay)
+
+    def __refresh_token(self, headers) -> bool:
+        """
+        Force a new bearer token through the Configuration's refresher after a 401 and put it in headers.
+        False when the Configuration cannot refresh its token or the refresh failed.
+        """
+        refresher = getattr(self.configuration, 'refresh_api_key_hook', None)
+        if refresher is None or not hasattr(refresher, 'force_refresh') or headers is None:
+            return False
+        rejected = headers.get(AUTHORIZATION_HEADER)
+        try:
+            refresher.force_refresh(self.configuration, rejected_token=rejected and rejected.split(' ')[-1])
+        except Exception as e:
+            logger.error(f'RateLimitedApiClient: Token refresh for {self.configuration.host} failed: {e}')
+            return False
+        headers[AUTHORIZATION_HEADER] = self.configuration.get_api_key_with_prefix(AUTHORIZATION_HEADER)
+        return True
@@ -9,6 +9,18 @@ class KeyValueModel:
 
 
 class BaseModel:
+    def get_key_value_envs(self, data: List[KeyValueModel]) -> list:
+        """
+        Env list for a container spec, e.g. [{'name': 'A', 'value': '1'}].
+        """
+        return [{'name': env.name, 'value': str(env.value)} for env in data]
+
+    def get_key_value_labels(self, data: List[KeyValueModel]) -> dict:
+        """
+        Labels or selector dict, values are always strings as the API requires.
+        """
+        return {label.name: str(label.value) for label in data}
+
     def get_key_value_params_envs(self, data: List[KeyValueModel], indent_line: int) -> str:
         envs = list()
         space = ''
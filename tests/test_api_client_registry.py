@@ -0,0 +1,52 @@
+import unittest
+
+try:
+    from kubernetes import client
+except ImportError:
+    client = None
+
+HOST = 'https://cluster.example.com'
+
+
+def static_token_configuration(token: str, verify_ssl: bool = True):
+    configuration = client.Configuration(host=HOST)
+    configuration.api_key['authorization'] = token
+    configuration.api_key_prefix['authorization'] = 'Bearer'
+    configuration.verify_ssl = verify_ssl
+    return configuration
+
+
+@unittest.skipUnless(client is not None, 'kubernetes client is not installed')
+class ApiClientRegistryTest(unittest.TestCase):
+    def setUp(self):
+        from kubernetes.api_client_registry import ApiClientRegistry
+
+        self.registry = ApiClientRegistry()
+        self.addCleanup(self.registry.shutdown)
+
+    def test_same_static_token_reuses_client(self):
+        api_client = self.registry.get(static_token_configuration('token-a'))
+        self.assertIs(self.registry.get(static_token_configuration('token-a')), api_client)
+
+    def test_static_token_principals_do_not_supersede_each_other(self):
+        first = self.registry.get(static_token_configuration('token-a'))
+        second = self.registry.get(static_token_configuration('token-b'))
+        self.assertIsNot(first, second)
+        self.assertIs(self.registry.get(static_token_configuration('token-a')), first)
+        self.assertIs(self.registry.get(static_token_configuration('token-b')), second)
+
+    def test_new_tls_settings_supersede_client(self):
+        first = self.registry.get(static_token_configuration('token-a'))
+        second = self.registry.get(static_token_configuration('token-a', verify_ssl=False))
+        self.assertIsNot(first, second)
+        self.assertIs(self.registry.get(static_token_configuration('token-a', verify_ssl=False)), second)
+
+    def test_token_not_kept_in_slot(self):
+        from kubernetes.api_client_registry import _slot, _settings
+
+        configuration = static_token_configuration('token-a')
+        self.assertNotIn('token-a', _slot(configuration) + _settings(configuration))
+
+
+if __name__ == '__main__':
+    unittest.main()
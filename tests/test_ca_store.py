@@ -0,0 +1,65 @@
+import base64
+import copy
+import gc
+import os
+import unittest
+
+from configuration.ca_store import CAStore
+
+CA = base64.b64encode(b'-----BEGIN CERTIFICATE-----\ntest\n-----END CERTIFICATE-----\n').decode()
+
+
+class Configuration:
+    """
+    Stand-in for kubernetes.client.Configuration, whose __deepcopy__ deep-copies every attribute.
+    """
+
+    def __init__(self):
+        self.ssl_ca_cert = None
+
+    def __deepcopy__(self, memo):
+        result = Configuration.__new__(Configuration)
+        memo[id(self)] = result
+        for key, value in self.__dict__.items():
+            setattr(result, key, copy.deepcopy(value, memo))
+        return result
+
+
+class CAStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = CAStore()
+        self.addCleanup(self.store.cleanup)
+
+    def test_file_shared_and_removed_with_last_configuration(self):
+        first, second = Configuration(), Configuration()
+        self.store.attach(first, CA)
+        self.store.attach(second, CA)
+        path = str(first.ssl_ca_cert)
+        self.assertEqual(second.ssl_ca_cert, path)
+        with open(path, 'rb') as fh:
+            self.assertEqual(fh.read(), base64.b64decode(CA))
+        del first
+        gc.collect()
+        self.assertTrue(os.path.exists(path))
+        del second
+        gc.collect()
+        self.assertFalse(os.path.exists(path))
+
+    def test_copies_keep_file(self):
+        for copier in (copy.copy, copy.deepcopy):
+            with self.subTest(copier=copier.__name__):
+                configuration = Configuration()
+                self.store.attach(configuration, CA)
+                path = str(configuration.ssl_ca_cert)
+                copied = copier(configuration)
+                del configuration
+                gc.collect()
+                self.assertTrue(os.path.exists(path))
+                self.assertEqual(copied.ssl_ca_cert, path)
+                del copied
+                gc.collect()
+                self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from configuration import cache
+from configuration.cache import ConfigurationCache
+
+TTL = 0.2  # Seconds
+REFRESH_BEFORE_EXPIRY = 0.1  # Seconds, entries are refreshed TTL - REFRESH_BEFORE_EXPIRY after their build
+
+
+class CountingBuilder:
+    def __init__(self, host='https://cluster', fail_after: int = None):
+        self.host = host
+        self.fail_after = fail_after
+        self.builds = 0
+
+    def __call__(self):
+        self.builds += 1
+        if self.fail_after is not None and self.builds > self.fail_after:
+            raise Exception('build failed')
+        return SimpleNamespace(host=self.host, build=self.builds)
+
+
+def wait_for(condition, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+class ConfigurationCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ConfigurationCache(refresh_before_expiry=REFRESH_BEFORE_EXPIRY)
+        self.addCleanup(self.cache.clear)
+
+    def test_concurrent_misses_share_one_build(self):
+        release = threading.Event()
+        builder = CountingBuilder()
+
+        def slow_builder():
+            release.wait()
+            return builder()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get(('k',), slow_builder, ttl=60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: self.cache.stats()['coalesced'] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(builder.builds, 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_unused_entry_lapses(self):
+        builder = CountingBuilder()
+        self.cache.get(('k',), builder, ttl=TTL)
+        wait_for(lambda: self.cache.stats()['size'] == 0)
+        self.assertEqual(builder.builds, 1)
+        self.assertEqual(self.cache.stats()['refreshes'], 0)
+
+    def test_used_entry_refreshed(self):
+        builder = CountingBuilder()
+        self.cache.get(('k',), builder, ttl=TTL)
+        self.cache.get(('k',), builder, ttl=TTL)
+        wait_for(lambda: self.cache.stats()['refreshes'] == 1)
+        self.assertEqual(self.cache.get(('k',), builder, ttl=TTL).build, 2)
+
+    def test_refresh_error_counted_and_entry_kept(self):
+        builder = CountingBuilder(fail_after=1)
+        value = self.cache.get(('k',), builder, ttl=TTL)
+        self.cache.get(('k',), builder, ttl=TTL)
+        wait_for(lambda: self.cache.stats()['refresh_errors'] == 1)
+        self.assertIs(self.cache.get(('k',), builder, ttl=TTL), value)
+
+    def test_invalidate_host(self):
+        for key, host in (('a', 'https://one'), ('b', 'https://one'), ('c', 'https://two')):
+            self.cache.get((key,), CountingBuilder(host=host), ttl=60)
+        self.assertEqual(self.cache.invalidate_host('https://one'), 2)
+        self.assertEqual(self.cache.stats()['size'], 1)
+        builder = CountingBuilder(host='https://one')
+        self.cache.get(('a',), builder, ttl=60)
+        self.assertEqual(builder.builds, 1)
+
+    def test_azure_key_includes_secret(self):
+        builds = []
+
+        def get_azure_kubernetes_config(**kwargs):
+            builds.append(kwargs['client_secret'])
+            return SimpleNamespace(host='https://aks')
+
+        azure_config = SimpleNamespace(get_azure_kubernetes_config=get_azure_kubernetes_config)
+        params = dict(tenant_id='t', client_id='c', resource_group='rg', cluster_name='aks', subscription_id='s')
+        with mock.patch.dict(sys.modules, {'configuration.azure.azure_config': azure_config}), \
+                mock.patch.object(cache, 'configuration_cache', self.cache):
+            for secret in ('secret-1', 'secret-1', 'secret-2'):
+                cache.get_cached_azure_kubernetes_config(client_secret=secret, **params)
+        self.assertEqual(builds, ['secret-1', 'secret-2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import random
+import unittest
+
+from kubernetes.properties import decode_value, encode_value, dumps, loads
+
+try:
+    from kubernetes import client
+except ImportError:
+    client = None
+
+NAMESPACE = 'test'
+
+
+def large_properties(seed: int) -> dict:
+    """
+    Random hex barely compresses, two values outgrow one compressed config map.
+    """
+    rng = random.Random(seed)
+    return {f'engine.blob.{i}': rng.randbytes(600 * 1024).hex() for i in range(2)}
+
+
+class PropertiesCodecTest(unittest.TestCase):
+    def test_values_round_trip(self):
+        for value in (True, False, 0, 1, -1, 42, -42, '007', '-0', '+1', '1.5', 'a=b', '', 'text', 'null'):
+            with self.subTest(value=value):
+                self.assertEqual(decode_value(encode_value(value)), value)
+
+    def test_negative_zero_stays_str(self):
+        self.assertEqual(decode_value('-0'), '-0')
+
+    def test_capitalised_bools_decode(self):
+        self.assertIs(decode_value('True'), True)
+        self.assertIs(decode_value('False'), False)
+
+    def test_properties_round_trip(self):
+        properties = {'a': 1, 'b': 'x=y', 'c': True, 'd': '-0', 'e': ''}
+        self.assertEqual(loads(dumps(properties)), properties)
+
+
+@unittest.skipUnless(client is not None, 'kubernetes client is not installed')
+class ConfigMapManagerTest(unittest.TestCase):
+    def setUp(self):
+        from benchmarks.fake_apiserver import FakeApiServer
+        from kubernetes.config_map import ConfigMapManager
+
+        self.server = FakeApiServer().start()
+        self.addCleanup(self.server.stop)
+        self.new_manager = lambda: ConfigMapManager(NAMESPACE, configuration=client.Configuration(host=self.server.url))
+        self.manager = self.new_manager()
+
+    def names(self) -> list:
+        return sorted(item.metadata.name for item in self.manager.list_namespaced_config_map().items)
+
+    def test_sharded_round_trip(self):
+        properties = large_properties(seed=1)
+        self.manager.create('cm', properties)
+        self.assertEqual(self.new_manager().read_properties('cm'), properties)
+        shards = [name for name in self.names() if name != 'cm']
+        self.assertGreater(len(shards), 1)
+        self.assertTrue(all(name.startswith('cm-shard-') for name in shards))
+
+    def test_new_shard_set_replaces_old(self):
+        self.manager.create('cm', large_properties(seed=1))
+        old_shards = set(self.names()) - {'cm'}
+        properties = large_properties(seed=2)
+        self.manager.patch('cm', properties)
+        self.assertEqual(self.new_manager().read_properties('cm'), properties)
+        new_shards = set(self.names()) - {'cm'}
+        self.assertGreater(len(new_shards), 1)
+        self.assertFalse(old_shards & new_shards)
+
+    def test_shrink_to_unsharded(self):
+        self.manager.create('cm', large_properties(seed=1))
+        # A fresh manager knows nothing of the shards, it learns them from the main config map.
+        self.new_manager().patch('cm', {'a': 1})
+        self.assertEqual(self.names(), ['cm'])
+        self.assertEqual(self.manager.read_properties('cm'), {'a': 1})
+
+    def test_create_conflict_keeps_sharded_map(self):
+        properties = large_properties(seed=1)
+        self.manager.create('cm', properties)
+        names = self.names()
+        for conflicting in (large_properties(seed=2), properties):
+            with self.subTest(same_content=conflicting is properties):
+                with self.assertRaises(client.ApiException) as raised:
+                    self.new_manager().create('cm', conflicting)
+                self.assertEqual(raised.exception.status, 409)
+                self.assertEqual(self.names(), names)
+                self.assertEqual(self.manager.read_properties('cm'), properties)
+
+    def test_unsharded_patch_is_one_request(self):
+        self.manager.create('cm', {'a': 1})
+        self.server.reset_stats()
+        self.manager.patch('cm', {'a': 2})
+        self.assertEqual(self.server.stats()['requests'], {'PATCH': 1})
+
+    def test_delete_removes_shards(self):
+        self.manager.create('cm', large_properties(seed=1))
+        self.new_manager().delete('cm')
+        self.assertEqual(self.names(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
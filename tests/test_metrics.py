@@ -0,0 +1,59 @@
+import unittest
+
+from kubernetes.metrics import API_RESPONSE_SIZE, metrics, observe_api_request
+
+
+class StreamingResponse:
+    """
+    Stand-in for the urllib3 HTTPResponse returned with _preload_content=False.
+    """
+
+    def __init__(self, headers):
+        self.headers = headers
+        self.status = 200
+
+    @property
+    def data(self):
+        raise AssertionError('streaming response body was read')
+
+
+class PreloadedResponse:
+    """
+    Stand-in for the client's RESTResponse, which wraps the urllib3 response and holds its body.
+    """
+
+    def __init__(self, data):
+        self.urllib3_response = object()
+        self.data = data
+        self.status = 200
+
+
+class ObserveApiRequestTest(unittest.TestCase):
+    URL = 'https://cluster/apis/apps/v1/namespaces/default/deployments'
+
+    def setUp(self):
+        metrics.reset()
+        metrics.enable()
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def observe(self, response, query_params=None):
+        observe_api_request('https://cluster', 'GET', self.URL, query_params, None, response, 200, 0.01)
+
+    def test_streaming_response_body_is_not_read(self):
+        self.observe(StreamingResponse(headers={}), query_params=[('watch', True)])
+        self.assertNotIn(API_RESPONSE_SIZE, metrics.render_prometheus())
+
+    def test_streaming_response_size_from_content_length(self):
+        self.observe(StreamingResponse(headers={'Content-Length': '512'}))
+        self.assertRegex(metrics.render_prometheus(), rf'{API_RESPONSE_SIZE}_sum{{[^}}]*}} 512\.0')
+
+    def test_preloaded_response_size_from_body(self):
+        self.observe(PreloadedResponse(b'x' * 100))
+        self.assertRegex(metrics.render_prometheus(), rf'{API_RESPONSE_SIZE}_sum{{[^}}]*}} 100\.0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from types import SimpleNamespace
+
+try:
+    from kubernetes import client
+except ImportError:
+    client = None
+
+
+def daemon_set(update_strategy: str, updated: int, ready: int = 3, generation: int = 2, observed: int = 2):
+    return SimpleNamespace(
+        metadata=SimpleNamespace(generation=generation),
+        spec=SimpleNamespace(update_strategy=SimpleNamespace(type=update_strategy)),
+        status=SimpleNamespace(
+            observed_generation=observed,
+            desired_number_scheduled=3,
+            current_number_scheduled=3,
+            updated_number_scheduled=updated,
+            number_ready=ready
+        )
+    )
+
+
+@unittest.skipUnless(client is not None, 'kubernetes client is not installed')
+class DaemonSetStatusTest(unittest.TestCase):
+    def setUp(self):
+        from kubernetes.rollout import _daemon_set_status
+
+        self.is_ready = lambda obj: _daemon_set_status(obj)[0]
+
+    def test_rolling_update_waits_for_updated_pods(self):
+        self.assertFalse(self.is_ready(daemon_set('RollingUpdate', updated=1)))
+        self.assertTrue(self.is_ready(daemon_set('RollingUpdate', updated=3)))
+
+    def test_on_delete_ignores_updated_pods(self):
+        self.assertTrue(self.is_ready(daemon_set('OnDelete', updated=0)))
+        self.assertFalse(self.is_ready(daemon_set('OnDelete', updated=0, ready=2)))
+
+    def test_waits_for_observed_generation(self):
+        self.assertFalse(self.is_ready(daemon_set('OnDelete', updated=3, observed=1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
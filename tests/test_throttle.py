@@ -0,0 +1,172 @@
+import unittest
+from unittest import mock
+
+try:
+    from kubernetes import client
+    from urllib3.exceptions import ProtocolError, SSLError
+except ImportError:
+    client = None
+
+URL = '/api/v1/namespaces/test/configmaps'
+
+
+class Refresher:
+    """
+    Stand-in for BearerTokenRefresher, hands out token-<n> on every forced refresh.
+    """
+
+    def __init__(self):
+        self.refreshes = 0
+
+    def __call__(self, configuration):
+        pass
+
+    def force_refresh(self, configuration, rejected_token=None):
+        self.refreshes += 1
+        configuration.api_key['authorization'] = f'token-{self.refreshes}'
+
+
+@unittest.skipUnless(client is not None, 'kubernetes client is not installed')
+class ClusterThrottleTest(unittest.TestCase):
+    def setUp(self):
+        from kubernetes.throttle import ClusterThrottle
+
+        self.throttle = ClusterThrottle(qps=10, burst=2)
+
+    @mock.patch('time.sleep')
+    def test_burst_then_wait(self, sleep):
+        for _ in range(3):
+            self.throttle.acquire()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.1, places=2)
+        stats = self.throttle.stats()
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['throttled_requests'], 1)
+
+    def test_throttled_response_halves_rate_until_successes(self):
+        self.throttle.on_error(429)
+        self.assertEqual(self.throttle.rate, 5)
+        self.throttle.on_error(500)
+        self.assertEqual(self.throttle.rate, 5)
+        for _ in range(100):
+            self.throttle.on_success()
+        self.assertEqual(self.throttle.rate, 10)
+
+    def test_rate_never_below_min_qps(self):
+        from kubernetes.throttle import MIN_QPS
+
+        for _ in range(10):
+            self.throttle.on_error(503)
+        self.assertEqual(self.throttle.rate, MIN_QPS)
+
+
+@unittest.skipUnless(client is not None, 'kubernetes client is not installed')
+class RateLimitedApiClientTest(unittest.TestCase):
+    def setUp(self):
+        from kubernetes import throttle
+
+        self.throttle = throttle
+        for name, value in (('max_retries', 2), ('backoff_base', 0.0)):
+            patcher = mock.patch.object(throttle.throttle_registry, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # A host per test, so every test starts from a full token bucket.
+        self.configuration = client.Configuration(host=f'https://{self.id()}')
+        self.api_client = throttle.RateLimitedApiClient(configuration=self.configuration)
+        self.addCleanup(self.api_client.close)
+        self.failures = []
+        throttle.add_failure_callback(self.on_failure)
+        self.addCleanup(throttle.remove_failure_callback, self.on_failure)
+
+    def on_failure(self, host, reason, error):
+        self.failures.append((host, reason, error))
+
+    def request(self, method, *responses, headers=None):
+        """
+        Send method through the client while ApiClient.request answers with responses, raising the exceptions.
+        Returns the number of attempts.
+        """
+        with mock.patch.object(client.ApiClient, 'request', side_effect=list(responses)) as request:
+            try:
+                self.api_client.request(method, URL, headers=headers)
+            finally:
+                self.attempts = request.call_count
+        return self.attempts
+
+    def test_configuration_left_untouched(self):
+        self.assertIsNone(self.configuration.retries)
+        self.assertEqual(self.api_client.configuration.retries, 0)
+
+    def test_retry_classification(self):
+        retried = [
+            ('POST', client.ApiException(status=429)),
+            ('PATCH', client.ApiException(status=503)),
+            ('GET', client.ApiException(status=500)),
+            ('PUT', client.ApiException(status=502)),
+            ('DELETE', client.ApiException(status=504)),
+            ('GET', ProtocolError('Connection aborted')),
+        ]
+        not_retried = [
+            ('POST', client.ApiException(status=500)),
+            ('PATCH', client.ApiException(status=502)),
+            ('POST', client.ApiException(status=504)),
+            ('POST', ProtocolError('Connection aborted')),
+            ('GET', client.ApiException(status=404)),
+        ]
+        for cases, attempts in ((retried, 3), (not_retried, 1)):
+            for method, error in cases:
+                with self.subTest(method=method, error=error):
+                    with self.assertRaises(type(error)):
+                        self.request(method, *[error] * attempts)
+                    self.assertEqual(self.attempts, attempts)
+
+    def test_retry_then_success(self):
+        self.assertEqual(self.request('POST', client.ApiException(status=429), 'response'), 2)
+        self.assertEqual(self.throttle.throttle_registry.get(self.configuration.host).stats()['retries'], 1)
+
+    def test_unauthorized_refreshes_token_once(self):
+        self.configuration.refresh_api_key_hook = Refresher()
+        self.configuration.api_key_prefix['authorization'] = 'Bearer'
+        self.api_client = self.throttle.RateLimitedApiClient(configuration=self.configuration)
+        self.addCleanup(self.api_client.close)
+        headers = {'authorization': 'Bearer token-0'}
+        self.assertEqual(self.request('GET', client.ApiException(status=401), 'response', headers=headers), 2)
+        self.assertEqual(headers['authorization'], 'Bearer token-1')
+        self.assertEqual(self.failures, [])
+
+        with self.assertRaises(client.ApiException):
+            self.request('GET', *[client.ApiException(status=401)] * 3, headers=headers)
+        self.assertEqual(self.attempts, 2)
+        self.assertEqual([reason for _, reason, _ in self.failures], [self.throttle.FAILURE_AUTH])
+
+    def test_unauthorized_without_refresher_is_not_retried(self):
+        with self.assertRaises(client.ApiException):
+            self.request('GET', client.ApiException(status=401), headers={'authorization': 'Bearer static'})
+        self.assertEqual(self.attempts, 1)
+        self.assertEqual([reason for _, reason, _ in self.failures], [self.throttle.FAILURE_AUTH])
+
+    def test_tls_failure_callback(self):
+        error = SSLError('certificate verify failed')
+        with self.assertRaises(SSLError):
+            self.request('POST', error)
+        self.assertEqual(self.failures, [(self.configuration.host, self.throttle.FAILURE_TLS, error)])
+
+    def test_failing_callback_does_not_break_others(self):
+        def broken(host, reason, error):
+            raise RuntimeError('broken')
+
+        self.throttle.add_failure_callback(broken)
+        self.addCleanup(self.throttle.remove_failure_callback, broken)
+        with self.assertRaises(client.ApiException):
+            self.request('GET', client.ApiException(status=401))
+        self.assertEqual(len(self.failures), 1)
+
+    def test_removed_callback_not_called(self):
+        self.throttle.remove_failure_callback(self.on_failure)
+        with self.assertRaises(client.ApiException):
+            self.request('GET', client.ApiException(status=401))
+        self.assertEqual(self.failures, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import copy
+import time
+import unittest
+
+from configuration.token_refresh import BearerTokenRefresher
+
+
+class Configuration:
+    """
+    Stand-in for kubernetes.client.Configuration, whose __deepcopy__ deep-copies every attribute.
+    """
+
+    def __init__(self):
+        self.api_key = {}
+        self.api_key_prefix = {}
+        self.refresh_api_key_hook = None
+
+    def __deepcopy__(self, memo):
+        result = Configuration.__new__(Configuration)
+        memo[id(self)] = result
+        for key, value in self.__dict__.items():
+            setattr(result, key, copy.deepcopy(value, memo))
+        return result
+
+
+class BearerTokenRefresherTest(unittest.TestCase):
+    def setUp(self):
+        self.fetches = 0
+
+    def fetch_token(self, force_refresh):
+        self.fetches += 1
+        return f'token-{self.fetches}', time.time() + 3600
+
+    def test_copies_share_the_refresher(self):
+        refresher = BearerTokenRefresher(self.fetch_token)
+        configuration = refresher.attach(Configuration(), 'token-0', time.time() + 3600)
+        deep = copy.deepcopy(configuration)
+        shallow = copy.copy(configuration)
+        self.assertIs(deep.refresh_api_key_hook, refresher)
+        self.assertIs(shallow.refresh_api_key_hook, refresher)
+
+    def test_copy_receives_refreshed_token(self):
+        refresher = BearerTokenRefresher(self.fetch_token)
+        configuration = refresher.attach(Configuration(), 'token-0', time.time() + 3600)
+        deep = copy.deepcopy(configuration)
+        refresher.force_refresh(configuration, rejected_token='token-0')
+        deep.refresh_api_key_hook(deep)
+        self.assertEqual(deep.api_key['authorization'], 'token-1')
+        self.assertEqual(self.fetches, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()